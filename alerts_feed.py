@@ -0,0 +1,108 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List
+
+from metrics import registry
+from scraper_utils import fetch_transsee_conditional, parse_transsee_data
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Shown until the first successful fetch, matching get_go_transit_updates()
+FALLBACK_MESSAGES = ["Lakeshore West Line: Service operating normally"]
+
+FETCH_SECONDS = registry.histogram('gotransit_alerts_fetch_duration_seconds', 'TransSee alerts fetch latency',
+                                   buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+FETCH_RESULTS = registry.counter('gotransit_alerts_fetches_total', 'TransSee alerts fetches by result', ['result'])
+
+class AlertsFeed:
+    """
+    Shared, background-refreshed cache of TransSee service alerts.
+    One daemon thread per process fetches on a fixed interval with conditional GETs;
+    readers always get the last good messages without waiting on the network.
+    """
+
+    def __init__(self, interval: float = 60, initial_wait: float = 3):
+        self.interval = interval  # Seconds between upstream fetches
+        self.initial_wait = initial_wait  # Seconds the first reader waits for the first fetch
+        self._messages = None  # Last good messages, None until the first success
+        self._etag = None
+        self._last_modified = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._first_fetch = threading.Event()
+        self._stop = threading.Event()
+
+        # Refresh bookkeeping
+        self.last_success = None  # time.time() of the last 200 or 304
+        self.last_error = None
+        self.fetches = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        """Start the background refresher if it is not already running"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='alerts-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refresher"""
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def refresh(self) -> None:
+        """Fetch the feed once, keeping the last good messages on any failure"""
+        self.fetches += 1
+        started = time.perf_counter()
+        try:
+            response = fetch_transsee_conditional(self._etag, self._last_modified)
+            if response.status_code == 304:
+                self.not_modified += 1
+                FETCH_RESULTS.labels('not_modified').inc()
+            else:
+                messages = [msg['message'] for msg in parse_transsee_data(response.text)]
+                self._etag = response.headers.get('ETag')
+                self._last_modified = response.headers.get('Last-Modified')
+                self._messages = messages
+                FETCH_RESULTS.labels('ok').inc()
+            self.last_success = time.time()
+            self.last_error = None
+        except Exception as e:
+            self.errors += 1
+            FETCH_RESULTS.labels('error').inc()
+            self.last_error = str(e)
+            logger.error(f"Error refreshing alerts feed: {e}")
+        finally:
+            FETCH_SECONDS.observe(time.perf_counter() - started)
+            self._first_fetch.set()
+
+    def get_messages(self) -> List[str]:
+        """Get the current alert messages (stale-while-revalidate)"""
+        self.start()
+        if self._messages is None:
+            self._first_fetch.wait(self.initial_wait)
+        messages = self._messages
+        return list(messages) if messages is not None else list(FALLBACK_MESSAGES)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get refresh counters and the age of the cached messages"""
+        return {
+            'fetches': self.fetches,
+            'not_modified': self.not_modified,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'age_seconds': time.time() - self.last_success if self.last_success else None
+        }
+
+alerts_feed = AlertsFeed(interval=float(os.environ.get("ALERTS_REFRESH_INTERVAL", 60)))
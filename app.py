@@ -1,11 +1,16 @@
 import os
+import hmac
+import click
 import logging
 import time
-from datetime import datetime
+import signal
+import threading
+from datetime import datetime, timedelta
 from functools import wraps
-from flask import Flask, render_template, jsonify, request, session, Response, stream_with_context
-from flask_socketio import SocketIO, emit
-from db_init import create_app, db
+from flask import Flask, render_template, jsonify, request, session, g, Response, stream_with_context
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from db_init import create_app, db, query_profiler, pool_stats
+from metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -13,50 +18,193 @@ logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = create_app()
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Multi-worker deployments fan Socket.IO emits out through a message queue,
+# e.g. SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0; without one they stay in-process
+SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE") or None
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=SOCKETIO_MESSAGE_QUEUE)
+
+# Prometheus metrics for /metrics. With several worker processes, point METRICS_DIR at a
+# directory they share and a scrape of any worker reports the totals of all of them
+metrics_registry.configure(os.environ.get("METRICS_DIR") or None,
+                           flush_interval=float(os.environ.get("METRICS_FLUSH_INTERVAL", 5)),
+                           retention=float(os.environ.get("METRICS_RETENTION", 600)))
+REQUEST_SECONDS = metrics_registry.histogram('gotransit_http_request_duration_seconds',
+                                             'Time to produce a response, by route', ['route', 'method'])
+REQUESTS = metrics_registry.counter('gotransit_http_requests_total', 'Responses by route and status',
+                                    ['route', 'method', 'status'])
+
+def record_request(route, method, status, seconds):
+    """Record one response in the request metrics"""
+    REQUEST_SECONDS.labels(route, method).observe(seconds)
+    REQUESTS.labels(route, method, status).inc()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Label by URL rule, not path, so station names and 404s cannot grow the label set
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        record_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
 
 # Import models and data modules after db initialization to avoid circular imports
-from models import Station, Schedule
+from models import Station, Schedule, migrate_station_lines, stations_on_line
 import sys
 sys.path.append('.')  # Ensure the current directory is in the path
 from gtfs_parser import gtfs_data
 from go_scraper import scraper
+from alerts_feed import alerts_feed
+from schedule_cache import ScheduleCache
+from schedule_push import SchedulePublisher
+from sse_hub import BroadcastHub
+from rate_limiter import create_rate_limiter
+from request_profiler import RequestProfiler, collapsed_stacks, pstats_dump, pstats_text
+import json_encoding
+import schedule_store
 
 # Configure socket logging
 logging.getLogger('socketio').setLevel(logging.ERROR)
 logging.getLogger('engineio').setLevel(logging.ERROR)
 
-# Make sure GTFS data is loaded
-gtfs_data.load_data()
+# Load GTFS data in the background so the server binds its port immediately;
+# /readyz reports when it is done
+gtfs_data.start_background_load()
+
+# Pick up a new feed in attached_assets/ without a restart: the files are polled every
+# GTFS_WATCH_INTERVAL seconds (0 disables), and SIGHUP or /api/admin/reload_gtfs reload on demand
+GTFS_WATCH_INTERVAL = float(os.environ.get("GTFS_WATCH_INTERVAL", 30))
+if GTFS_WATCH_INTERVAL > 0:
+    gtfs_data.start_watcher(GTFS_WATCH_INTERVAL)
+
+def handle_sighup(signum, frame):
+    gtfs_data.reload_in_background('SIGHUP')
 
-# Rate limiting implementation
-class RateLimiter:
-    def __init__(self, limit=30, window=60):
-        self.limit = limit  # Number of requests allowed
-        self.window = window  # Time window in seconds
-        self.clients = {}  # {ip: [timestamps]}
+try:
+    signal.signal(signal.SIGHUP, handle_sighup)
+except (AttributeError, ValueError):
+    # No SIGHUP on Windows, and handlers can only be installed from the main thread
+    logger.debug("SIGHUP reload trigger not installed")
 
-    def is_rate_limited(self, ip):
-        current_time = time.time()
+# Create rate limiter instances
+api_limiter = create_rate_limiter(limit=60, window=60, name='api')  # 60 requests per minute for API
+sse_limiter = create_rate_limiter(limit=10, window=60, name='sse')  # 10 SSE connections per minute
+
+# Seconds an API request waits for the initial GTFS load before answering 503
+GTFS_READY_WAIT = float(os.environ.get("GTFS_READY_WAIT", 5))
+
+@app.before_request
+def wait_for_gtfs_data():
+    """Hold API requests briefly while GTFS data loads, then turn them away with 503"""
+    # Admin endpoints (e.g. reload_gtfs) must work while the data is loading or after it failed
+    if not request.path.startswith('/api/') or request.path == '/api/metrics' or request.path.startswith('/api/admin/'):
+        return None
+    if gtfs_data.ensure_loaded(timeout=GTFS_READY_WAIT):
+        return None
+    if gtfs_data.settled.is_set():
+        # The first load failed; answer at once until a reload succeeds
+        response = jsonify({'error': 'Transit data is unavailable. Please try again later.'})
+    else:
+        response = jsonify({'error': 'Transit data is still loading. Please try again shortly.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
 
-        # If client IP not in dictionary, add it
-        if ip not in self.clients:
-            self.clients[ip] = []
+# Streams would hold their generation in memory for as long as they stay open
+UNPINNED_PATHS = ('/api/sse/station_updates', '/api/alerts/stream')
 
-        # Clean up old timestamps
-        self.clients[ip] = [t for t in self.clients[ip] if current_time - t < self.window]
+@app.before_request
+def pin_gtfs_generation():
+    """Serve the whole request from one GTFS generation, even if a reload swaps in another"""
+    if gtfs_data.is_ready() and request.path not in UNPINNED_PATHS:
+        g.gtfs_pin = gtfs_data.pin()
 
-        # Check if rate limit exceeded
-        if len(self.clients[ip]) >= self.limit:
-            return True
+@app.teardown_request
+def unpin_gtfs_generation(exc):
+    token = g.pop('gtfs_pin', None)
+    if token is not None:
+        gtfs_data.unpin(token)
 
-        # Add current timestamp
-        self.clients[ip].append(current_time)
-        return False
+# Admin endpoints require an X-Admin-Token header matching ADMIN_TOKEN, and are disabled
+# without one: behind a same-host reverse proxy every client looks local
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
 
-# Create rate limiter instances
-api_limiter = RateLimiter(limit=60, window=60)  # 60 requests per minute for API
-sse_limiter = RateLimiter(limit=10, window=60)  # 10 SSE connections per minute
+def is_admin_request():
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+def require_admin(f):
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Not found'}), 404
+        if not is_admin_request():
+            return jsonify({'error': 'Forbidden'}), 403
+        return f(*args, **kwargs)
+    return wrapped
+
+@app.route('/api/admin/reload_gtfs', methods=['POST'])
+@require_admin
+def reload_gtfs():
+    """Reload the GTFS feed; the current generation keeps serving if the new one is rejected"""
+    if gtfs_data.reload('admin endpoint'):
+        return jsonify({'status': 'reloaded', **gtfs_data.stats()})
+    return jsonify({'status': 'rejected', **gtfs_data.stats()}), 422
+
+# Profile a sample of requests (REQUEST_PROFILE_SAMPLE, e.g. 0.01) and admin requests sent with
+# X-Profile-Request: 1; the sample rate can be changed at runtime through /api/admin/profiler
+request_profiler = RequestProfiler(sample_rate=float(os.environ.get("REQUEST_PROFILE_SAMPLE", 0)),
+                                   keep=int(os.environ.get("REQUEST_PROFILE_KEEP", 20)))
+request_profiler.install(app, is_admin_request)
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST'])
+@require_admin
+def profiler_settings():
+    """List kept request profiles, or change the sample rate and buffer size"""
+    if request.method == 'POST':
+        options = request.get_json(silent=True) or request.form
+        try:
+            request_profiler.configure(options.get('sample_rate'), options.get('keep'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'sample_rate must be a number and keep an integer'}), 400
+        if options.get('clear'):
+            request_profiler.clear()
+    return jsonify(request_profiler.stats())
+
+@app.route('/api/admin/profiler/<int:profile_id>')
+@require_admin
+def profiler_profile(profile_id):
+    """One kept profile as collapsed stacks (default), a pstats report (text) or pstats data (pstats)"""
+    entry = request_profiler.get(profile_id)
+    if entry is None:
+        return jsonify({'error': 'Profile not found'}), 404
+
+    output = request.args.get('format', 'collapsed')
+    if output == 'collapsed':
+        return Response(collapsed_stacks(entry['profile']), mimetype='text/plain')
+    if output == 'text':
+        return Response(pstats_text(entry['profile'], request.args.get('sort', 'cumulative')), mimetype='text/plain')
+    if output == 'pstats':
+        response = Response(pstats_dump(entry['profile']), mimetype='application/octet-stream')
+        response.headers['Content-Disposition'] = f'attachment; filename="request-{profile_id}.pstats"'
+        return response
+    return jsonify({'error': 'format must be collapsed, text or pstats'}), 400
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: 200 once GTFS data and its indexes are loaded, 503 until then"""
+    if gtfs_data.is_ready():
+        return jsonify({'status': 'ready', 'stations': len(gtfs_data.station_names), **gtfs_data.stats()})
+    return jsonify({'status': 'loading', **gtfs_data.stats()}), 503
 
 # Rate limit decorator
 def rate_limit(limiter):
@@ -72,9 +220,24 @@ def rate_limit(limiter):
         return wrapped
     return decorator
 
+# Boards and control panels opened without ?display= all share this display, as before
+DEFAULT_DISPLAY_ID = 'default'
+
+def get_display_id():
+    """Id of the display this session controls; ?display=<id> pins a board or control panel to one"""
+    requested = request.args.get('display')
+    if requested:
+        session['display_id'] = requested[:64]
+    return session.get('display_id', DEFAULT_DISPLAY_ID)
+
+def display_room(display_id):
+    """Socket.IO room for one display's station changes"""
+    return f"display:{display_id}"
+
 @app.route('/')
 def display():
     """Main display board route"""
+    get_display_id()
     selected_station = session.get('selected_station', 'Union Station')
     return render_template('display.html', 
                          station=selected_station)
@@ -82,6 +245,7 @@ def display():
 @app.route('/control')
 def control():
     """Control panel for station selection"""
+    get_display_id()
     # Get station list from GTFS data
     stations = {}
     for station_name in scraper.get_available_stations():
@@ -93,34 +257,76 @@ def control():
                          stations=stations,
                          selected_station=session.get('selected_station', 'Union Station'))
 
+def format_schedules(schedule_data):
+    """Format scraper schedule entries for the display board"""
+    formatted_schedules = []
+    for schedule in schedule_data:
+        status = schedule['status']
+        if status == 'On time':
+            status = schedule['platform'] if schedule['platform'] else '-'
+
+        # Format the time from datetime object
+        departure_time = schedule['departure_time'].strftime('%H:%M')
+
+        formatted_schedules.append({
+            'departure': departure_time,
+            'destination': schedule['destination'].upper(),
+            'train': f"{schedule['route_code']} {schedule['destination']}",
+            'status': status,
+            'color': schedule['color'],
+            'accessible': schedule['accessible']
+        })
+    return formatted_schedules
+
+# Set SCHEDULE_SOURCE=database to serve departures persisted with `flask load-schedules`
+SCHEDULE_SOURCE = os.environ.get("SCHEDULE_SOURCE", "gtfs")
+
+def get_schedule_data(station):
+    """Get a station's schedule from the configured source, falling back to the scraper"""
+    if SCHEDULE_SOURCE == 'database':
+        try:
+            # Also called from background tasks, outside any request
+            with app.app_context():
+                schedule_data = schedule_store.get_next_departures(station, datetime.now())
+            if schedule_data:
+                return schedule_data
+        except Exception as e:
+            logger.error(f"Error reading persisted schedules: {e}")
+    return scraper.get_station_schedule(station)
+
+def build_schedule_payload(station):
+    """Build the raw and formatted schedules for a station, pre-serialized as JSON"""
+    schedule_data = get_schedule_data(station)
+    formatted_schedules = format_schedules(schedule_data)
+    schedule_json = json_encoding.dumps(schedule_data)
+    formatted_json = json_encoding.dumps(formatted_schedules)
+    return {
+        'schedule': schedule_data,
+        'schedule_json': schedule_json,
+        'schedule_etag': json_encoding.etag(schedule_json),
+        'formatted': formatted_schedules,
+        'formatted_json': formatted_json,
+        'formatted_etag': json_encoding.etag(formatted_json)
+    }
+
+def json_body_response(body, etag=None):
+    """Respond with pre-encoded JSON, or 304 Not Modified if the client's copy is current"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag or json_encoding.etag(body))
+    # Let caches keep the body but always revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# Boards poll the same stations repeatedly; serve them from a per-minute cache
+schedule_cache = ScheduleCache(build_schedule_payload, lambda: gtfs_data.generation)
+
 @app.route('/api/schedules')
 def get_schedules():
     """API endpoint to get the current schedule data (for AJAX updates)"""
-    station = request.args.get('station', 'Union Station')
+    station = scraper.resolve_station(request.args.get('station', 'Union Station'))
     try:
-        # Get schedules from scraper
-        schedule_data = scraper.get_station_schedule(station)
-
-        # Format schedules for display
-        formatted_schedules = []
-        for schedule in schedule_data:
-            status = schedule['status']
-            if status == 'On time':
-                status = schedule['platform'] if schedule['platform'] else '-'
-
-            # Format the time from datetime object
-            departure_time = schedule['departure_time'].strftime('%H:%M')
-
-            formatted_schedules.append({
-                'departure': departure_time,
-                'destination': schedule['destination'].upper(),
-                'train': f"{schedule['route_code']} {schedule['destination']}",
-                'status': status,
-                'color': schedule['color'],
-                'accessible': schedule['accessible']
-            })
-
-        return jsonify(formatted_schedules)
+        payload = schedule_cache.get(station)
+        return json_body_response(payload['formatted_json'], payload['formatted_etag'])
     except Exception as e:
         logger.error(f"Error fetching schedules: {str(e)}")
         return jsonify({'error': 'Failed to fetch schedules'}), 500
@@ -130,65 +336,132 @@ def get_schedules():
 def set_station():
     """Set the station for display"""
     station = request.form.get('station')
-    if station in scraper.get_available_stations():
+    if scraper.has_station(station):
         session['selected_station'] = station
-        # Emit station update via WebSocket
-        socketio.emit('station_update', {'station': station})
+        # Emit station update via WebSocket and SSE to this display only
+        display_id = get_display_id()
+        socketio.emit('station_update', {'station': station}, to=display_room(display_id))
+        sse_hub.publish(f"station:{display_id}",
+                        {'event': 'station_update', 'station': station, 'display': display_id})
         return jsonify({'status': 'success'})
     return jsonify({'status': 'error', 'message': 'Invalid station'}), 400
 
+# One hub fans SSE updates out to every connected display
+sse_hub = BroadcastHub()
+sse_hub.add_producer('alerts', lambda: {"alerts": scraper.get_alerts()}, interval=30)
+
+def sse_response(stream):
+    """Wrap an SSE frame generator in a streaming response"""
+    response = Response(stream_with_context(stream), mimetype="text/event-stream")
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/sse/station_updates')
 @rate_limit(sse_limiter)
 def sse_station_updates():
     """Server-Sent Events endpoint for real-time station updates"""
-    def event_stream():
-        # Send initial event
-        yield f"data: {{'event': 'connected'}}\n\n"
-
-        # Keep the connection alive
-        while True:
-            # Check if session has a selected station
-            station = session.get('selected_station', 'Union Station')
-
-            # Send station update every 5 seconds
-            yield f"data: {{'event': 'station_update', 'station': '{station}'}}\n\n"
-            time.sleep(5)  # Sleep to avoid too frequent updates
+    # Send the connected event and this session's station, then station changes as they happen
+    station = session.get('selected_station', 'Union Station')
+    initial = [{'event': 'connected'}, {'event': 'station_update', 'station': station}]
+    return sse_response(sse_hub.stream(f"station:{get_display_id()}", initial))
 
-    response = Response(stream_with_context(event_stream()),
-                      mimetype="text/event-stream")
-    response.headers['Cache-Control'] = 'no-cache'
-    response.headers['X-Accel-Buffering'] = 'no'
-    return response
+# Station shown by each Socket.IO client, read from its session once on connect
+client_stations = {}
 
 # WebSocket events
 @socketio.on('connect')
 def handle_connect():
     """Handle WebSocket connection"""
+    client_stations[request.sid] = session.get('selected_station', 'Union Station')
+    join_room(display_room(session.get('display_id', DEFAULT_DISPLAY_ID)))
     logger.debug('Client connected via WebSocket')
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle WebSocket disconnection"""
+    client_stations.pop(request.sid, None)
+    schedule_publisher.unsubscribe(request.sid)
     logger.debug('Client disconnected from WebSocket')
 
 @socketio.on('request_station')
 def handle_station_request():
     """Handle request for current station via WebSocket"""
-    station = session.get('selected_station', 'Union Station')
-    emit('station_update', {'station': station})
+    emit('station_update', {'station': client_stations.get(request.sid, 'Union Station')})
+
+# Push schedule changes to Socket.IO clients as per-station deltas instead of polling
+schedule_publisher = SchedulePublisher(lambda station: schedule_cache.get(station)['formatted'],
+                                       interval=float(os.environ.get("SCHEDULE_PUSH_INTERVAL", 1)))
+schedule_pusher = None
+schedule_pusher_lock = threading.Lock()
+
+def push_schedule_updates():
+    """Background task emitting schedule deltas to each station's room"""
+    while True:
+        # Every worker pushes to its own clients, so keep these off the message queue
+        for station, event, payload in schedule_publisher.tick():
+            socketio.emit(event, payload, to=SchedulePublisher.room(station), ignore_queue=True)
+        socketio.sleep(schedule_publisher.interval)
+
+# Sent instead of a snapshot while the GTFS data is loading (or failed to load)
+SCHEDULE_UNAVAILABLE = {'error': 'Transit data is still loading', 'retry_after': 5}
+
+@socketio.on('subscribe_schedule')
+def handle_schedule_subscribe(data=None):
+    """Join a station's schedule room and send the snapshot deltas will build on"""
+    global schedule_pusher
+    if not gtfs_data.is_ready():
+        # No timetable to build a snapshot from yet; the board keeps polling and asks again
+        emit('schedule_unavailable', SCHEDULE_UNAVAILABLE)
+        return
+    station = scraper.resolve_station((data or {}).get('station', 'Union Station'))
+
+    previous = schedule_publisher.station_for(request.sid)
+    if previous:
+        leave_room(SchedulePublisher.room(previous))
+    snapshot = schedule_publisher.subscribe(request.sid, station)
+    client_stations[request.sid] = station
+    join_room(SchedulePublisher.room(station))
+    emit('schedule_snapshot', snapshot)
+
+    with schedule_pusher_lock:
+        if schedule_pusher is None:
+            schedule_pusher = socketio.start_background_task(push_schedule_updates)
+
+def get_line_station_names(line_code):
+    """Names of the stations on a line, from the station_line index when stations are persisted"""
+    try:
+        names = [station.name for station in stations_on_line(line_code)]
+        if names:
+            return names
+    except Exception as e:
+        logger.error(f"Error querying stations on line {line_code}: {e}")
+    return [name for name in scraper.get_available_stations()
+            if line_code in (gtfs_data.get_station_by_name(name) or {}).get('lines', ())]
+
+# (generation, encoded station list, etag) for /api/stations
+stations_json = (None, b'', None)
 
 @app.route('/api/stations')
 def get_stations():
-    """API endpoint to get the list of available stations"""
-    stations = scraper.get_available_stations()
-    return jsonify(stations)
+    """API endpoint to get the list of available stations, optionally only those on ?line="""
+    line = request.args.get('line')
+    if line:
+        return json_body_response(json_encoding.dumps(get_line_station_names(line)))
+
+    # The station list only changes on a GTFS load, so encode it once per generation
+    global stations_json
+    if stations_json[0] != gtfs_data.generation:
+        body = json_encoding.dumps(scraper.get_available_stations())
+        stations_json = (gtfs_data.generation, body, json_encoding.etag(body))
+    return json_body_response(stations_json[1], stations_json[2])
 
 @app.route('/api/alerts')
 def get_alerts():
     """API endpoint to get service alerts"""
     try:
         alerts = scraper.get_alerts()
-        return jsonify({"alerts": alerts})
+        return json_body_response(json_encoding.dumps({"alerts": alerts}))
     except Exception as e:
         logger.error(f"Error in alerts API: {e}")
         return jsonify({"alerts": []})
@@ -196,19 +469,7 @@ def get_alerts():
 @app.route('/api/alerts/stream')
 def stream_alerts():
     """SSE endpoint for streaming alerts"""
-    def generate():
-        while True:
-            try:
-                alerts = scraper.get_alerts()
-                data = {"alerts": alerts}
-                yield f"data: {json.dumps(data)}\n\n"
-                time.sleep(30)  # Update every 30 seconds
-            except Exception as e:
-                logger.error(f"Error in alerts stream: {e}")
-                yield f"data: {json.dumps({'alerts': []})}\n\n"
-                time.sleep(5)
-    
-    return Response(generate(), mimetype="text/event-stream")
+    return sse_response(sse_hub.stream('alerts'))
 
 @app.route('/alerts')
 def alerts_page():
@@ -220,6 +481,60 @@ def alerts_page():
         logger.error(f"Error in alerts page: {e}")
         return render_template('alerts.html', alerts=[])
 
+@app.route('/api/metrics')
+def metrics():
+    """Per-request query counts, connection pool usage and cache statistics"""
+    try:
+        pool = pool_stats()
+    except Exception as e:
+        logger.error(f"Error reading pool stats: {e}")
+        pool = {}
+    return jsonify({
+        'gtfs': gtfs_data.stats(),
+        'db': {**query_profiler.stats(), 'pool': pool},
+        'schedule_cache': schedule_cache.stats(),
+        'schedule_push': schedule_publisher.stats(),
+        'alerts_feed': alerts_feed.stats(),
+        'sse': sse_hub.stats(),
+        'rate_limited': {'api': api_limiter.rejected, 'sse': sse_limiter.rejected}
+    })
+
+def sse_clients_by_topic():
+    """SSE clients per topic family, so per-display station topics share one series"""
+    clients = {}
+    for topic, count in sse_hub.stats()['clients'].items():
+        family = topic.split(':', 1)[0]
+        clients[family] = clients.get(family, 0) + count
+    return clients
+
+# Read at scrape time from the components' own counters
+metrics_registry.gauge('gotransit_sse_clients', 'Connected SSE clients by topic', ['topic'],
+                       function=sse_clients_by_topic)
+metrics_registry.counter('gotransit_sse_messages_total', 'SSE messages published, and dropped for slow clients',
+                         ['result'], function=lambda: {'published': sse_hub.published, 'dropped': sse_hub.dropped})
+SOCKET_CLIENTS = metrics_registry.gauge('gotransit_socketio_clients', 'Connected Socket.IO clients',
+                                        function=lambda: len(client_stations))
+metrics_registry.gauge('gotransit_schedule_push_subscribers', 'Socket.IO clients receiving schedule deltas',
+                       function=lambda: schedule_publisher.stats()['clients'])
+metrics_registry.counter('gotransit_schedule_cache_requests_total', 'Schedule cache lookups by result', ['result'],
+                         function=lambda: {'hit': schedule_cache.hits, 'miss': schedule_cache.misses})
+metrics_registry.gauge('gotransit_schedule_cache_hit_ratio', 'Schedule cache hit ratio since start',
+                       function=lambda: schedule_cache.stats()['hit_ratio'], aggregate='mean')
+metrics_registry.counter('gotransit_rate_limited_total', 'Requests rejected by rate limiters', ['limiter'],
+                         function=lambda: {'api': api_limiter.rejected, 'sse': sse_limiter.rejected})
+metrics_registry.gauge('gotransit_gtfs_ready', 'Whether a GTFS generation is loaded',
+                       function=gtfs_data.is_ready, aggregate='min')
+metrics_registry.gauge('gotransit_gtfs_generation', 'Current GTFS feed generation',
+                       function=lambda: gtfs_data.current.generation, aggregate='max')
+metrics_registry.gauge('gotransit_gtfs_load_phase_seconds', 'Load time of the current GTFS generation by phase',
+                       ['phase'], aggregate='max',
+                       function=lambda: {phase: ms / 1000 for phase, ms in gtfs_data.current.load_timings.items()})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/api/current_time')
 def current_time():
     """API endpoint to get the current time (for AJAX updates)"""
@@ -231,11 +546,11 @@ def current_time():
 @app.route('/api/schedule', methods=['GET'])
 def api_schedule():
     """JSON API for schedule data"""
-    station = request.args.get('station', 'Union Station')
+    station = scraper.resolve_station(request.args.get('station', 'Union Station'))
 
     try:
-        schedule_data = scraper.get_station_schedule(station)
-        return jsonify(schedule_data)
+        payload = schedule_cache.get(station)
+        return json_body_response(payload['schedule_json'], payload['schedule_etag'])
     except Exception as e:
         logger.error(f"Error in API: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -244,14 +559,42 @@ def api_schedule():
 with app.app_context():
     try:
         db.create_all()
+        migrate_station_lines()
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
 
+def require_gtfs_data():
+    """Load the GTFS data for a CLI command, failing with the load error"""
+    if not gtfs_data.ensure_loaded():
+        raise click.ClickException(f"GTFS data failed to load: {gtfs_data.load_error}")
+
+@app.cli.command('load-schedules')
+@click.option('--date', 'service_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='First service day to load (default: today)')
+@click.option('--days', type=int, default=1, help='Number of service days to load')
+def load_schedules_command(service_date, days):
+    """Persist GTFS departures into the schedule table"""
+    require_gtfs_data()
+    first_day = service_date.date() if service_date else datetime.now().date()
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        start = time.perf_counter()
+        count = schedule_store.load_service_day(day)
+        elapsed = time.perf_counter() - start
+        click.echo(f"{day}: {count} departures in {elapsed:.2f} s ({count / elapsed if elapsed else 0:,.0f} rows/s)")
+
+@app.cli.command('load-stations')
+def load_stations_command():
+    """Persist GTFS stations and their lines into the station tables"""
+    require_gtfs_data()
+    click.echo(f"{schedule_store.sync_stations()} stations synced")
+
 # Enable CORS for development
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match')
+    response.headers.add('Access-Control-Expose-Headers', 'ETag')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE')
     return response
 
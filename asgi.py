@@ -0,0 +1,281 @@
+"""
+Asyncio (ASGI) serving mode for the display endpoints.
+
+Run with:  uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Board traffic (/api/schedules, /api/schedule, /api/alerts, both SSE streams and
+Socket.IO, including schedule deltas) is handled by coroutines, so an idle display connection costs a task
+instead of a worker thread. Every other route falls through to the Flask app,
+which runs in the default thread pool.
+"""
+import io
+import sys
+import time
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+import socketio
+from werkzeug.http import parse_etags, quote_etag
+from werkzeug.wrappers import Request
+
+import json_encoding
+from gtfs_parser import gtfs_data
+from app import (app, scraper, schedule_cache, schedule_publisher, sse_hub, sse_limiter,
+                 display_room, DEFAULT_DISPLAY_ID, SCHEDULE_UNAVAILABLE, record_request, SOCKET_CLIENTS,
+                 SOCKETIO_MESSAGE_QUEUE)
+from schedule_push import SchedulePublisher
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Share the Flask-SocketIO channel so emits from Flask routes in any worker reach these clients
+client_manager = (socketio.AsyncRedisManager(SOCKETIO_MESSAGE_QUEUE, channel='flask-socketio')
+                  if SOCKETIO_MESSAGE_QUEUE else None)
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', client_manager=client_manager)
+
+# Station selected by each Socket.IO client's Flask session, read on connect
+client_stations = {}
+SOCKET_CLIENTS.set_function(lambda: len(client_stations))
+
+def read_session(environ):
+    """Read the Flask session cookie in a WSGI-style environ"""
+    try:
+        return app.session_interface.open_session(app, Request(environ)) or {}
+    except Exception as e:
+        logger.debug(f"Could not read session cookie: {e}")
+        return {}
+
+@sio.event
+async def connect(sid, environ):
+    """Handle WebSocket connection"""
+    session = read_session(environ)
+    client_stations[sid] = session.get('selected_station', 'Union Station')
+    await sio.enter_room(sid, display_room(session.get('display_id', DEFAULT_DISPLAY_ID)))
+    logger.debug('Client connected via WebSocket')
+
+@sio.event
+async def disconnect(sid, *args):
+    """Handle WebSocket disconnection"""
+    client_stations.pop(sid, None)
+    schedule_publisher.unsubscribe(sid)
+    logger.debug('Client disconnected from WebSocket')
+
+@sio.on('request_station')
+async def handle_station_request(sid):
+    """Handle request for current station via WebSocket"""
+    await sio.emit('station_update', {'station': client_stations.get(sid, 'Union Station')}, to=sid)
+
+@sio.on('subscribe_schedule')
+async def handle_schedule_subscribe(sid, data=None):
+    """Join a station's schedule room and send the snapshot deltas will build on"""
+    if not gtfs_data.is_ready():
+        await sio.emit('schedule_unavailable', SCHEDULE_UNAVAILABLE, to=sid)
+        return
+    station = scraper.resolve_station((data or {}).get('station', 'Union Station'))
+
+    previous = schedule_publisher.station_for(sid)
+    if previous:
+        await sio.leave_room(sid, SchedulePublisher.room(previous))
+    # Building the first snapshot may hit the GTFS timetable, so keep it off the event loop
+    snapshot = await asyncio.to_thread(schedule_publisher.subscribe, sid, station)
+    client_stations[sid] = station
+    await sio.enter_room(sid, SchedulePublisher.room(station))
+    await sio.emit('schedule_snapshot', snapshot, to=sid)
+
+async def push_schedule_updates():
+    """Background task emitting schedule deltas to each station's room"""
+    while True:
+        for station, event, payload in await asyncio.to_thread(schedule_publisher.tick):
+            # Every worker pushes to its own clients, so keep these off the message queue
+            await sio.emit(event, payload, room=SchedulePublisher.room(station), ignore_queue=True)
+        await asyncio.sleep(schedule_publisher.interval)
+
+def on_startup():
+    """Forward station changes published by the Flask routes to Socket.IO clients"""
+    loop = asyncio.get_running_loop()
+
+    def forward_station_update(data):
+        emit = sio.emit('station_update', {'station': data['station']}, room=display_room(data['display']))
+        asyncio.run_coroutine_threadsafe(emit, loop)
+
+    # With a message queue, the Flask-SocketIO emit in set_station already reaches these clients
+    if not SOCKETIO_MESSAGE_QUEUE:
+        sse_hub.add_listener('station', forward_station_update)
+    sio.start_background_task(push_schedule_updates)
+
+async def send_body(send, status, body, content_type=b'application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'access-control-allow-origin', b'*'), *headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_json(send, scope, body, etag=None):
+    """Send pre-encoded JSON, or 304 Not Modified if the client's copy is current"""
+    etag = etag or json_encoding.etag(body)
+    headers = [(b'etag', quote_etag(etag).encode('latin-1')), (b'cache-control', b'no-cache'),
+               (b'access-control-expose-headers', b'ETag')]
+    if_none_match = dict(scope['headers']).get(b'if-none-match')
+    if if_none_match and parse_etags(if_none_match.decode('latin-1')).contains_weak(etag):
+        await send_body(send, 304, b'', headers=headers)
+    else:
+        await send_body(send, 200, body, headers=headers)
+
+async def send_sse(send, receive, subscription, initial=()):
+    """Stream a hub subscription as SSE until the client disconnects or is dropped"""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+
+    async def watch_disconnect():
+        # The stream notices at its next frame or heartbeat and unsubscribes
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.closed = True
+
+    watcher = asyncio.create_task(watch_disconnect())
+    stream = sse_hub.stream_async(subscription, initial)
+    try:
+        async for frame in stream:
+            if subscription.closed:
+                break
+            await send({'type': 'http.response.body', 'body': frame.encode('utf-8'), 'more_body': True})
+    except OSError:
+        pass
+    finally:
+        watcher.cancel()
+        await stream.aclose()
+
+async def wsgi_fallback(scope, receive, send):
+    """Run any other route through the Flask WSGI app in a worker thread"""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': (scope.get('server') or ('localhost', 80))[0],
+        'SERVER_PORT': str((scope.get('server') or ('localhost', 80))[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('127.0.0.1', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    def run_wsgi():
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        result = app.wsgi_app(environ, start_response)
+        try:
+            response['body'] = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response
+
+    response = await asyncio.to_thread(run_wsgi)
+    await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+    await send({'type': 'http.response.body', 'body': response['body']})
+
+# Routes served by coroutines below; Flask records its own requests
+NATIVE_ROUTES = ('/api/schedules', '/api/schedule', '/api/alerts', '/api/alerts/stream', '/api/sse/station_updates')
+
+def timed_send(send, route, method):
+    """Wrap send to record the request metrics when the response starts, as Flask does"""
+    started = time.perf_counter()
+
+    async def wrapped(message):
+        if message['type'] == 'http.response.start':
+            record_request(route, method, message['status'], time.perf_counter() - started)
+        await send(message)
+    return wrapped
+
+async def http_app(scope, receive, send):
+    """Route board endpoints to coroutines and everything else to Flask"""
+    if scope['type'] != 'http':
+        return
+
+    path = scope['path']
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+
+    if path in NATIVE_ROUTES:
+        send = timed_send(send, path, scope['method'])
+
+    if path in ('/api/schedules', '/api/schedule') and not gtfs_data.is_ready():
+        # Never block the event loop on the initial GTFS load
+        await send_body(send, 503, json_encoding.dumps({'error': 'Transit data is still loading. Please try again shortly.'}),
+                        headers=[(b'retry-after', b'5')])
+
+    elif path in ('/api/schedules', '/api/schedule') and scope['method'] == 'GET':
+        station = scraper.resolve_station(query.get('station', ['Union Station'])[0])
+        try:
+            # A miss builds the board (or queries the database), so keep that off the event loop
+            payload = schedule_cache.peek(station) or await asyncio.to_thread(schedule_cache.get, station)
+            if path == '/api/schedules':
+                await send_json(send, scope, payload['formatted_json'], payload['formatted_etag'])
+            else:
+                await send_json(send, scope, payload['schedule_json'], payload['schedule_etag'])
+        except Exception as e:
+            logger.error(f"Error fetching schedules: {e}")
+            await send_body(send, 500, json_encoding.dumps({'error': 'Failed to fetch schedules'}))
+
+    elif path == '/api/alerts' and scope['method'] == 'GET':
+        # The first call may wait for the initial fetch, so keep it off the event loop
+        alerts = await asyncio.to_thread(scraper.get_alerts)
+        await send_json(send, scope, json_encoding.dumps({"alerts": alerts}))
+
+    elif path == '/api/alerts/stream':
+        await send_sse(send, receive, sse_hub.subscribe_async('alerts'))
+
+    elif path == '/api/sse/station_updates':
+        client_ip = (scope.get('client') or ('127.0.0.1', 0))[0]
+        if sse_limiter.is_rate_limited(client_ip):
+            await send_body(send, 429, json_encoding.dumps({'error': 'Rate limit exceeded. Please try again later.'}))
+            return
+
+        environ = {'HTTP_COOKIE': dict(scope['headers']).get(b'cookie', b'').decode('latin-1'),
+                   'SERVER_NAME': 'asgi', 'SERVER_PORT': '0', 'REQUEST_METHOD': 'GET', 'wsgi.url_scheme': 'http'}
+        session = read_session(environ)
+        initial = [{'event': 'connected'},
+                   {'event': 'station_update', 'station': session.get('selected_station', 'Union Station')}]
+        topic = f"station:{session.get('display_id', DEFAULT_DISPLAY_ID)}"
+        await send_sse(send, receive, sse_hub.subscribe_async(topic), initial)
+
+    else:
+        await wsgi_fallback(scope, receive, send)
+
+application = socketio.ASGIApp(sio, other_asgi_app=http_app, on_startup=on_startup)
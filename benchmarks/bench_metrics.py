@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of metric updates on the request path, and of rendering /metrics.
+
+    python benchmarks/bench_metrics.py [--updates 1000000] [--routes 20]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Registry
+
+def bench(func, count):
+    """Call func count times; returns nanoseconds per call"""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) * 1e9 / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=1000000)
+    parser.add_argument('--routes', type=int, default=20)
+    args = parser.parse_args()
+
+    registry = Registry()
+    seconds = registry.histogram('bench_request_duration_seconds', 'Request latency', ['route', 'method'])
+    requests = registry.counter('bench_requests_total', 'Requests', ['route', 'method', 'status'])
+    routes = [f"/api/route{i}" for i in range(args.routes)]
+    for route in routes:
+        requests.labels(route, 'GET', 200).inc()
+
+    route = random.choice(routes)
+    print(f"counter inc:       {bench(lambda: requests.labels(route, 'GET', 200).inc(), args.updates):8.0f} ns")
+    print(f"histogram observe: {bench(lambda: seconds.labels(route, 'GET').observe(0.004), args.updates):8.0f} ns")
+    print(f"render:            {bench(registry.render, 100) / 1000:8.0f} µs")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of rate limiter checks/sec with 10k distinct client IPs.
+
+    python benchmarks/bench_rate_limiter.py [--ips 10000] [--checks 200000]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RateLimiter, SQLiteRateLimiter
+
+def bench(limiter, ips, checks):
+    """Run checks against random IPs; returns checks per second"""
+    sequence = [random.choice(ips) for _ in range(checks)]
+    start = time.perf_counter()
+    for ip in sequence:
+        limiter.is_rate_limited(ip)
+    return checks / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ips', type=int, default=10000)
+    parser.add_argument('--checks', type=int, default=200000)
+    args = parser.parse_args()
+
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.ips)]
+    print(f"in-memory: {bench(RateLimiter(limit=60, window=60), ips, args.checks):,.0f} checks/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        limiter = SQLiteRateLimiter(os.path.join(directory, 'limits.db'), limit=60, window=60)
+        print(f"sqlite:    {bench(limiter, ips, args.checks // 10):,.0f} checks/s")
+
+if __name__ == '__main__':
+    main()
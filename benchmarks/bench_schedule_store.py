@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Persisted schedule table: bulk load rows/sec and "next 24 departures" query latency.
+
+Runs against a temporary SQLite file, and against PostgreSQL when a URL is given
+(the database must exist; the schedule table in it is dropped and recreated):
+
+    python benchmarks/bench_schedule_store.py [--rows 200000] [--queries 500]
+    python benchmarks/bench_schedule_store.py --postgres postgresql://localhost/gotransit_bench
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from db_init import db
+from models import Schedule
+import schedule_store
+
+STATIONS = [f"Station {i} GO" for i in range(62)]
+
+def make_rows(count, service_date):
+    """Synthetic service day spread evenly over stations and 05:00-01:00"""
+    start = datetime.combine(service_date, datetime.min.time()) + timedelta(hours=5)
+    return [{
+        'station': STATIONS[i % len(STATIONS)],
+        'train_number': str(i % 10000),
+        'destination': 'LW - Union Station',
+        'departure_time': start + timedelta(seconds=(i * 72000) // count),
+        'status': 'On time',
+        'platform': None,
+        'route_code': 'LW',
+        'accessible': True,
+        'delay_minutes': 0,
+        'service_date': service_date
+    } for i in range(count)]
+
+def query_latencies(service_date, queries):
+    """Milliseconds per next-24 query at random stations and times"""
+    start = datetime.combine(service_date, datetime.min.time()) + timedelta(hours=5)
+    latencies = []
+    for _ in range(queries):
+        when = start + timedelta(seconds=random.randrange(72000))
+        began = time.perf_counter()
+        schedule_store.get_next_departures(random.choice(STATIONS), when, 24)
+        latencies.append((time.perf_counter() - began) * 1000)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+def bench(url, rows, queries):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    db.init_app(app)
+    service_date = date.today()
+    data = make_rows(rows, service_date)
+    results = {}
+
+    with app.app_context():
+        Schedule.__table__.drop(db.engine, checkfirst=True)
+        schedule_store.ensure_schema()
+
+        # Baseline: one ORM object per row, as init_demo_data used to do
+        sample = data[:min(len(data), 5000)]
+        began = time.perf_counter()
+        for row in sample:
+            db.session.add(Schedule(**row))
+        db.session.commit()
+        results['orm add rows/s'] = len(sample) / (time.perf_counter() - began)
+        db.session.query(Schedule).delete()
+        db.session.commit()
+
+        began = time.perf_counter()
+        schedule_store.bulk_insert(data)
+        db.session.commit()
+        results['bulk rows/s'] = len(data) / (time.perf_counter() - began)
+
+        if db.engine.dialect.name == 'postgresql':
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql(f"ANALYZE {Schedule.__table__.name}")
+        results['indexed query ms p50/p95'] = query_latencies(service_date, queries)
+
+        index = next(index for index in Schedule.__table__.indexes if index.name == 'ix_schedule_station_departure')
+        index.drop(db.engine)
+        results['unindexed query ms p50/p95'] = query_latencies(service_date, max(queries // 10, 10))
+        index.create(db.engine)
+
+        Schedule.__table__.drop(db.engine)
+        db.session.remove()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--postgres', help='PostgreSQL URL to benchmark as well')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        targets = [('sqlite', f"sqlite:///{os.path.join(directory, 'bench.db')}")]
+        if args.postgres:
+            targets.append(('postgres', args.postgres))
+
+        for name, url in targets:
+            for metric, value in bench(url, args.rows, args.queries).items():
+                if isinstance(value, tuple):
+                    print(f"{name:9} {metric:28} {value[0]:8.2f} / {value[1]:.2f}")
+                else:
+                    print(f"{name:9} {metric:28} {value:12,.0f}")
+
+if __name__ == '__main__':
+    main()
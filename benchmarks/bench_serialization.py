@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Serialization cost per 24-row departure board.
+
+Compares Flask's JSON provider (what jsonify used), json_encoding.dumps
+(orjson when installed, otherwise the stdlib) and the cached encoded body.
+
+    python benchmarks/bench_serialization.py [--rows 24] [--station 'Union Station'] [--iterations 20000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the feed load away from the real snapshot and departure index
+WORK_DIR = tempfile.TemporaryDirectory(prefix='gotransit-bench-')
+os.environ['GTFS_SNAPSHOT_PATH'] = os.path.join(WORK_DIR.name, 'gtfs_snapshot.pickle')
+os.environ['GTFS_DEPARTURE_INDEX_PATH'] = ''
+os.chdir(ROOT)
+
+import logging
+logging.disable(logging.WARNING)
+
+from flask import Flask
+
+import json_encoding
+
+def make_board(rows, station='Union Station'):
+    """A real GoScraper.get_station_schedule() board from the loaded feed, repeated to rows rows"""
+    from gtfs_parser import gtfs_data
+    from go_scraper import scraper
+
+    gtfs_data.ensure_loaded()
+    schedule = scraper.get_station_schedule(station)
+    return [dict(schedule[i % len(schedule)]) for i in range(rows)]
+
+def bench(encode, iterations):
+    """Microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=24)
+    parser.add_argument('--station', default='Union Station')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    board = make_board(args.rows, args.station)
+    cached = json_encoding.dumps(board)
+
+    with app.app_context():
+        assert app.json.loads(app.json.dumps(board)) == app.json.loads(cached)
+        print(f"flask json:     {bench(lambda: app.json.dumps(board).encode('utf-8'), args.iterations):8.1f} us/board")
+        print(f"jsonify:        {bench(lambda: app.json.response(board), args.iterations):8.1f} us/board")
+
+    encoder = 'orjson' if json_encoding.orjson is not None else 'stdlib'
+    print(f"json_encoding:  {bench(lambda: json_encoding.dumps(board), args.iterations):8.1f} us/board ({encoder})")
+    print(f"cached bytes:   {bench(lambda: cached, args.iterations):8.1f} us/board")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for GTFS loading, schedule building and the board API endpoints.
+
+Results are written as JSON and compared against a stored baseline; any benchmark
+slower than the baseline by more than the threshold is flagged and the exit code is 1.
+
+    python benchmarks/run_benchmarks.py                      # run and compare
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --save-baseline      # record a new baseline
+    python benchmarks/run_benchmarks.py --only gtfs_load_warm,api_schedules_cached
+
+Baselines are machine-specific: record one on the machine you compare on.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# Keep the run away from the real snapshot, departure index and database
+WORK_DIR = tempfile.mkdtemp(prefix='gotransit-bench-')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ['GTFS_SNAPSHOT_PATH'] = os.path.join(WORK_DIR, 'gtfs_snapshot.pickle')
+os.environ['GTFS_DEPARTURE_INDEX_PATH'] = os.path.join(WORK_DIR, 'gtfs_departures.bin')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ.pop('RATE_LIMIT_DB', None)
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import logging
+logging.disable(logging.WARNING)
+
+from gtfs_parser import GTFSData, gtfs_data
+
+# Served instead of the TransSee feed so API timings do not depend on the network
+STUB_ALERTS = ["Lakeshore West Line: Service operating normally",
+               "Kitchener Line: Delays of up to 10 minutes near Bramalea"]
+
+def measure(func, repeat, number=1):
+    """Run func number times per sample; returns per-call timings in milliseconds"""
+    func()  # Warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    return samples
+
+def define_benchmarks():
+    """Benchmarks as {name: (func, number of calls per sample)}; imports the app lazily"""
+    import app as app_module
+    from go_scraper import scraper
+    from stop_scraper import stop_scraper
+    from alerts_feed import alerts_feed
+
+    alerts_feed.get_messages = lambda: list(STUB_ALERTS)
+    gtfs_data.ensure_loaded()
+    client = app_module.app.test_client()
+    stations = list(gtfs_data.get_station_names())
+    routes = [(line, stops[0], stops[-1]) for line, stops in
+              ((line, stop_scraper.get_stops_for_route(line)) for line in ('LW', 'LE', 'ST', 'RH', 'BR', 'KI', 'MI'))]
+
+    def load_cold():
+        GTFSData().load_data(use_snapshot=False)
+
+    def load_warm():
+        GTFSData().load_data()
+
+    def station_schedules():
+        for station in stations:
+            scraper.get_station_schedule(station)
+
+    def upcoming_stops():
+        for line, origin, destination in routes:
+            stop_scraper.get_upcoming_stops(origin, destination, line)
+
+    def get(url):
+        def request():
+            response = client.get(url)
+            assert response.status_code == 200, f"{url}: {response.status_code}"
+        return request
+
+    def schedules_uncached():
+        app_module.schedule_cache.invalidate()
+        get('/api/schedules?station=Union%20Station')()
+
+    # Prime the snapshot so the warm load reads it
+    GTFSData().load_data()
+
+    return {
+        'gtfs_load_cold': (load_cold, 1),
+        'gtfs_load_warm': (load_warm, 1),
+        # Per station: the total is divided by the number of stations below
+        'station_schedule': (station_schedules, 1),
+        'upcoming_stops': (upcoming_stops, 100),
+        'api_schedules_uncached': (schedules_uncached, 5),
+        'api_schedules_cached': (get('/api/schedules?station=Union%20Station'), 50),
+        'api_stations': (get('/api/stations'), 50),
+        'api_alerts': (get('/api/alerts'), 50),
+    }, {'station_schedule': len(stations), 'upcoming_stops': len(routes)}
+
+def run(names, repeat):
+    benchmarks, per_item = define_benchmarks()
+    results = {}
+    for name, (func, number) in benchmarks.items():
+        if names and name not in names:
+            continue
+        random.seed(0)
+        divisor = per_item.get(name, 1)
+        samples = [sample / divisor for sample in measure(func, repeat, number)]
+        results[name] = {
+            'median_ms': statistics.median(samples),
+            'min_ms': min(samples),
+            'max_ms': max(samples),
+            'samples': len(samples)
+        }
+        print(f"{name:26} {results[name]['median_ms']:10.3f} ms (min {results[name]['min_ms']:.3f})", flush=True)
+    return results
+
+def compare(results, baseline, threshold):
+    """Compare medians with the baseline; returns the names of regressed benchmarks"""
+    regressions = []
+    print(f"\n{'benchmark':26} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            print(f"{name:26} {'-':>10} {result['median_ms']:10.3f}      new")
+            continue
+        change = result['median_ms'] / previous['median_ms'] - 1 if previous['median_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:26} {previous['median_ms']:10.3f} {result['median_ms']:10.3f} {change:+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=7, help='samples per benchmark')
+    parser.add_argument('--only', default='', help='comma-separated benchmark names')
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown, e.g. 0.25 = 25%%')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    args = parser.parse_args()
+
+    names = {name for name in args.only.split(',') if name}
+    document = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat
+        },
+        'results': run(names, args.repeat)
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(document['results'], baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
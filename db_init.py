@@ -1,8 +1,16 @@
 import os
-from flask import Flask
+import time
+import logging
+import threading
+from flask import Flask, g, has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from sqlalchemy.orm import DeclarativeBase
 
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
 # Set up the DeclarativeBase
 class Base(DeclarativeBase):
     pass
@@ -10,27 +18,149 @@ class Base(DeclarativeBase):
 # Initialize SQLAlchemy with our base
 db = SQLAlchemy(model_class=Base)
 
+# Single-node profile applied to every SQLite connection (SQLITE_PRAGMAS=off to disable)
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",  # Readers no longer block behind the writer
+    "PRAGMA synchronous=NORMAL",  # Safe with WAL, without an fsync per commit
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+)
+
+def env_flag(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+def engine_options(database_uri):
+    """Build SQLAlchemy engine options from DB_POOL_* environment variables"""
+    options = {
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 300)),
+        # Pre-ping costs a round-trip per checkout; pool_recycle already retires stale connections
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING", False),
+    }
+    if not database_uri.startswith("sqlite"):
+        options["pool_size"] = int(os.environ.get("DB_POOL_SIZE", 5))
+        options["max_overflow"] = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+        options["pool_timeout"] = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+    return options
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+class QueryProfiler:
+    """
+    Counts SQL statements and their time per request through SQLAlchemy engine events,
+    aggregated per endpoint. Requests issuing many statements are logged as likely N+1s.
+    """
+
+    def __init__(self, warn_queries=20):
+        self.warn_queries = warn_queries  # Statements per request that trigger a warning
+        self.endpoints = {}  # {endpoint: [requests, queries, query seconds, max queries]}
+        self.background = [0, 0.0]  # [queries, seconds] outside requests
+        self._lock = threading.Lock()
+
+    def install(self, app, engine):
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's context, so a statement that fails leaves nothing behind
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_start", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if has_request_context() and "query_count" in g:
+            g.query_count += 1
+            g.query_seconds += elapsed
+        else:
+            with self._lock:
+                self.background[0] += 1
+                self.background[1] += elapsed
+
+    def _start_request(self):
+        g.query_count = 0
+        g.query_seconds = 0.0
+
+    def _finish_request(self, response):
+        count, seconds = g.get("query_count", 0), g.get("query_seconds", 0.0)
+        if count:
+            response.headers["Server-Timing"] = f'db;dur={seconds * 1000:.2f};desc="{count} queries"'
+        endpoint = request.endpoint or "unknown"
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, [0, 0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += count
+            stats[2] += seconds
+            stats[3] = max(stats[3], count)
+        if count >= self.warn_queries:
+            logger.warning(f"{endpoint} ran {count} queries in {seconds * 1000:.1f} ms (possible N+1)")
+        return response
+
+    def stats(self):
+        """Get per-endpoint query counts and times"""
+        with self._lock:
+            return {
+                "endpoints": {
+                    endpoint: {
+                        "requests": requests,
+                        "queries": queries,
+                        "queries_per_request": queries / requests if requests else 0.0,
+                        "max_queries": max_queries,
+                        "query_ms": seconds * 1000,
+                        "query_ms_per_request": seconds * 1000 / requests if requests else 0.0
+                    }
+                    for endpoint, (requests, queries, seconds, max_queries) in self.endpoints.items()
+                },
+                "background": {"queries": self.background[0], "query_ms": self.background[1] * 1000}
+            }
+
+query_profiler = QueryProfiler(warn_queries=int(os.environ.get("DB_QUERY_WARN_COUNT", 20)))
+
+def pool_stats():
+    """Get connection pool usage for the metrics endpoint"""
+    pool = db.engine.pool
+    stats = {"class": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
-    
+
     # Configure secret key
     app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
-    
+
     # Configure database connection
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///gotransit.db")
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
-    
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+
     # Initialize the database with the app
     db.init_app(app)
-    
+
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite" and env_flag("SQLITE_PRAGMAS", True):
+            event.listen(db.engine, "connect", apply_sqlite_pragmas)
+        query_profiler.install(app, db.engine)
+
     # Ensure the instance folder exists
     try:
         os.makedirs(os.path.join(app.instance_path), exist_ok=True)
     except OSError:
         pass
-    
-    return app
\ No newline at end of file
+
+    return app
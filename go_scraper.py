@@ -14,10 +14,6 @@ STATUS_WEIGHTS = [0.85, 0.10, 0.05]  # Probabilities for each status
 class GoScraper:
     """Scraper for GO Transit schedules with display protections"""
 
-    def __init__(self):
-        if not gtfs_data.stations:
-            gtfs_data.load_data()
-
     def get_line_color(self, line_code):
         """Get the official GO Transit color for a line code"""
         return gtfs_data.get_line_color(line_code)
@@ -26,11 +22,24 @@ class GoScraper:
         """Return the list of available stations from GTFS data"""
         return gtfs_data.get_station_names()
 
+    def has_station(self, station_name):
+        """Check whether a station name is available"""
+        return gtfs_data.has_station(station_name)
+
+    def resolve_station(self, station_name):
+        """Get a valid station name, falling back to Union Station (or the first station); None before any are loaded"""
+        if self.has_station(station_name):
+            return station_name
+        if self.has_station("Union Station"):
+            return "Union Station"
+        stations = self.get_available_stations()
+        return stations[0] if stations else None
+
     def get_alerts(self):
-        """Get service alerts"""
-        from scraper_utils import get_go_transit_updates
+        """Get service alerts from the background-refreshed alerts feed"""
+        from alerts_feed import alerts_feed
         try:
-            alerts = get_go_transit_updates()
+            alerts = alerts_feed.get_messages()
             return [{"text": alert} for alert in alerts]
         except Exception as e:
             logger.error(f"Error fetching alerts: {e}")
@@ -41,15 +50,10 @@ class GoScraper:
         logger.debug(f"Generating schedule for {station_name}")
 
         # Ensure GTFS data is loaded
-        if not gtfs_data.stations:
-            gtfs_data.load_data()
-
-        # Get available stations
-        available_stations = self.get_available_stations()
+        gtfs_data.ensure_loaded()
 
         # Validate station name
-        if station_name not in available_stations:
-            station_name = "Union Station" if "Union Station" in available_stations else available_stations[0]
+        station_name = self.resolve_station(station_name)
 
         # Get station info
         station_info = gtfs_data.get_station_by_name(station_name)
@@ -57,10 +61,50 @@ class GoScraper:
             logger.warning(f"Station '{station_name}' not found")
             return []
 
-        # Generate schedule
-        train_schedule = []
         now = datetime.now()
 
+        # Use the GTFS timetable when the feed has departures for this station
+        departures = gtfs_data.get_next_departures(station_info, now, limit=24)
+        if departures:
+            return self._build_timetable_schedule(departures)
+
+        logger.debug(f"No timetable departures for {station_name}, generating schedule")
+        return self._generate_schedule(station_name, station_info, now)
+
+    def _clean_destination(self, headsign):
+        """Get a display destination from a headsign (e.g. "LW - Niagara Falls GO")"""
+        destination = headsign.split(' - ', 1)[-1]
+        return destination.replace(" GO", "").replace(" Station", "")
+
+    def _build_timetable_schedule(self, departures):
+        """Build schedule entries from GTFS timetable departures"""
+        train_schedule = []
+        for departure in departures:
+            line_code = departure['route_code']
+            destination = self._clean_destination(departure['trip_headsign'])
+
+            train_schedule.append({
+                "departure_time": departure['departure_time'],
+                "destination": destination,
+                "destination_fr": destination,
+                "status": "On time",
+                "estimated": "On time",
+                "platform": None,  # Static GTFS has no platform assignments
+                "route_code": line_code,
+                "accessible": departure['wheelchair_accessible'] == 1,
+                "train_number": departure['trip_id'].rsplit('-', 1)[-1],
+                "color": self.get_line_color(line_code),
+                "is_express": False,
+                "at_platform": False,
+                "stops": "" # Protected - stops not displayed by GO scraper
+            })
+
+        return train_schedule
+
+    def _generate_schedule(self, station_name, station_info, now):
+        """Generate a simulated schedule when the feed has no timetable for a station"""
+        train_schedule = []
+
         # Get available lines for station
         available_lines = station_info.get('lines', [])
         if not available_lines:
@@ -1,23 +1,176 @@
 import os
 import csv
+import time
+import pickle
+import hashlib
 import logging
-from datetime import datetime
+import tempfile
+import threading
+import contextvars
+from array import array
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import date, datetime, time as time_of_day, timedelta
 from flask import current_app
-from typing import Dict, List, Optional, Any
+from metrics import registry
+from timetable import Timetable
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: builds are not coordinated between processes
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Compiled snapshot of the parsed feed, reused while the source files are unchanged.
+# Set GTFS_SNAPSHOT_PATH to an empty string to always parse the CSV files.
+DEFAULT_SNAPSHOT_PATH = os.path.join("instance", "gtfs_snapshot.pickle")
+SNAPSHOT_VERSION = 4
+
+# Memory-mapped departure index shared by every worker process.
+# Set GTFS_DEPARTURE_INDEX_PATH to an empty string to keep departures on the heap.
+DEFAULT_DEPARTURE_INDEX_PATH = os.path.join("instance", "gtfs_departures.bin")
+
+# Feed directory and the files a load reads (the calendar files through the timetable phase)
+GTFS_BASE_PATH = "attached_assets"
+GTFS_SOURCE_FILES = ("agency.txt", "routes.txt", "stops.txt", "trips.txt", "stop_times.txt",
+                     "calendar.txt", "calendar_dates.txt")
+
+LOAD_SECONDS = registry.histogram('gotransit_gtfs_load_duration_seconds', 'GTFS feed load and validation time',
+                                  ['result'], buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+
+def _stat_source(filepath: str) -> Optional[Dict[str, int]]:
+    """Return the size and mtime of a source file, or None if it is missing"""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _hash_source(filepath: str) -> Optional[str]:
+    """Return the SHA-256 of a source file, or None if it is missing"""
+    try:
+        with open(filepath, 'rb') as file:
+            return hashlib.file_digest(file, 'sha256').hexdigest()
+    except OSError:
+        return None
+
+@contextmanager
+def _build_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on path.lock while building the files at path"""
+    if not path or fcntl is None:
+        yield
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        lock_file = open(f"{path}.lock", 'a')
+    except OSError as e:
+        logger.warning(f"Could not open GTFS build lock for {path}: {e}")
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)  # Released when the file is closed
+        yield
+
+class StringColumn:
+    """Column of repetitive strings stored as indexes into a table of distinct values"""
+    
+    __slots__ = ('values', 'codes', '_lookup')
+    
+    def __init__(self):
+        self.values = []  # Distinct strings, in first-seen order
+        self.codes = array('I')  # One index into values per row
+        self._lookup = {}
+    
+    def append(self, value: str) -> None:
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+    
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+    
+    def __getstate__(self):
+        # The lookup table is only needed while appending and is rebuilt on demand
+        return self.values, self.codes
+    
+    def __setstate__(self, state):
+        self.values, self.codes = state
+        self._lookup = {value: code for code, value in enumerate(self.values)}
+
+class TripTable(Mapping):
+    """
+    Column-oriented storage for GTFS trips.
+    Behaves like the former {trip_id: trip dict} mapping, building each trip dict on access.
+    """
+    
+    # Fields in trip dict order; small integer flags are stored as signed bytes
+    FIELDS = ('route_id', 'service_id', 'trip_headsign', 'direction_id', 'block_id',
+              'shape_id', 'wheelchair_accessible', 'bikes_allowed', 'route_code')
+    INT_FIELDS = ('direction_id', 'wheelchair_accessible', 'bikes_allowed')
+    
+    def __init__(self):
+        self.trip_ids = []
+        self.rows = {}  # Row index by trip_id
+        self.columns = {field: array('b') if field in self.INT_FIELDS else StringColumn()
+                        for field in self.FIELDS}
+    
+    def add(self, trip_id: str, trip: Dict[str, Any]) -> None:
+        """Add or replace a trip; replacing keeps the old row as unreachable garbage"""
+        # Check every value before touching a column, so a bad row cannot leave them uneven
+        for field in self.INT_FIELDS:
+            if not -128 <= trip[field] <= 127:
+                raise OverflowError(f"Trip {trip_id}: {field} {trip[field]} does not fit a signed byte")
+        values = [trip[field] for field in self.FIELDS]
+        for column, value in zip(self.columns.values(), values):
+            column.append(value)
+        self.rows[trip_id] = len(self.trip_ids)
+        self.trip_ids.append(trip_id)
+    
+    def get_field(self, trip_id: str, field: str) -> Any:
+        """Read a single field without building the whole trip dict"""
+        return self.columns[field][self.rows[trip_id]]
+    
+    def __getitem__(self, trip_id: str) -> Dict[str, Any]:
+        row = self.rows[trip_id]
+        return {field: column[row] for field, column in self.columns.items()}
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.rows)
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __contains__(self, trip_id: object) -> bool:
+        return trip_id in self.rows
+
 class GTFSData:
     """Class to handle GTFS data parsing and storage"""
     
     def __init__(self):
         self.routes = {}  # Routes by route_id
         self.stops = {}   # Stops by stop_id
-        self.trips = {}   # Trips by trip_id
+        self.trips = TripTable()  # Trips by trip_id
         self.agencies = {}  # Agencies by agency_id
         self.stations = {}  # Stations by stop_id (filtered for train stations)
+        self.timetable = Timetable()  # Departures by stop_id from stop_times
+        self.load_timings = {}  # Milliseconds spent in each load phase
+        self.loaded_from_snapshot = False
+        self.generation = 0  # Incremented on every load so derived caches can tell data changed
+        
+        # Lookup indexes, rebuilt by _build_indexes() after every load
+        self.station_names = ()  # Station names in load order
+        self.station_name_set = frozenset()
+        self._stations_by_name = {}
+        self._stations_by_normalized_name = {}
+        self._stations_by_code = {}
+        self._stops_by_parent = {}
+        self._stop_ids_by_parent = {}
         
         # GO Transit colors by line code
         self.LINE_COLORS = {
@@ -35,24 +188,159 @@ class GTFSData:
         """Get the official GO Transit color for a line code"""
         return self.LINE_COLORS.get(line_code, self.LINE_COLORS["GO"])
     
-    def load_data(self) -> None:
-        """Load all GTFS data from files"""
+    # Attributes persisted in the compiled snapshot
+    SNAPSHOT_FIELDS = ('agencies', 'routes', 'stops', 'trips', 'stations', 'timetable')
+    
+    def load_data(self, use_snapshot: bool = True, validate: Optional[Callable[['GTFSData'], None]] = None) -> None:
+        """
+        Load all GTFS data from the compiled snapshot, or from files if it is stale.
+        The data is passed to validate before a freshly parsed feed is written to the snapshot and
+        departure index, so a feed it rejects (by raising) never replaces the files other workers use.
+        """
         # Define the path to the GTFS files
-        base_path = "attached_assets"
+        base_path = GTFS_BASE_PATH
+        
+        # Load each file in dependency order (trips need routes and stations),
+        # timing every phase so slow startups are visible in the logs
+        phases = [
+            ('agencies', self._load_agencies, "agency.txt"),
+            ('routes', self._load_routes, "routes.txt"),
+            ('stops', self._load_stops, "stops.txt"),
+            ('trips', self._load_trips, "trips.txt"),
+            ('timetable', self._load_timetable, "stop_times.txt"),
+        ]
         
-        # Load agencies
-        self._load_agencies(os.path.join(base_path, "agency.txt"))
+        # The calendar files are read by the timetable phase but must also invalidate the snapshot
+        snapshot_path = os.environ.get("GTFS_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH) if use_snapshot else ''
+        sources = {filename: os.path.join(base_path, filename) for filename in GTFS_SOURCE_FILES}
         
-        # Load routes
-        self._load_routes(os.path.join(base_path, "routes.txt"))
+        index_path = os.environ.get("GTFS_DEPARTURE_INDEX_PATH", DEFAULT_DEPARTURE_INDEX_PATH)
         
-        # Load stops (stations)
-        self._load_stops(os.path.join(base_path, "stops.txt"))
+        self.load_timings = {}
+        # One process at a time builds the shared files; the others wait, find the fresh
+        # snapshot and map the same index file, so its pages stay shared between them
+        with _build_lock(index_path or snapshot_path):
+            start = time.perf_counter()
+            self.loaded_from_snapshot = bool(snapshot_path) and self._load_snapshot(snapshot_path, sources)
+            
+            if self.loaded_from_snapshot:
+                self.load_timings['snapshot'] = (time.perf_counter() - start) * 1000
+            else:
+                for phase, loader, filename in phases:
+                    start = time.perf_counter()
+                    loader(sources[filename])
+                    self.load_timings[phase] = (time.perf_counter() - start) * 1000
+            
+            start = time.perf_counter()
+            self._build_indexes()
+            self.load_timings['indexes'] = (time.perf_counter() - start) * 1000
+            
+            if validate:
+                validate(self)
+            if not self.loaded_from_snapshot:
+                self._persist(snapshot_path, index_path, sources)
         
-        # Load trips
-        self._load_trips(os.path.join(base_path, "trips.txt"))
+        self.generation += 1
         
         logger.info(f"Loaded {len(self.routes)} routes, {len(self.stops)} stops, {len(self.trips)} trips, {len(self.stations)} stations")
+        logger.info("GTFS load timings: " + ", ".join(f"{phase} {ms:.1f} ms" for phase, ms in self.load_timings.items())
+                    + f" (total {sum(self.load_timings.values()):.1f} ms)")
+    
+    def _persist(self, snapshot_path: str, index_path: str, sources: Dict[str, str]) -> None:
+        """Write the departure index, then the snapshot that refers to it"""
+        if index_path and len(self.timetable):
+            try:
+                self.timetable.save_index(index_path)
+            except Exception as e:
+                logger.warning(f"Could not write departure index {index_path}: {e}")
+        
+        if snapshot_path:
+            self._write_snapshot(snapshot_path, sources)
+    
+    def _load_snapshot(self, snapshot_path: str, sources: Dict[str, str]) -> bool:
+        """
+        Restore parsed data from a snapshot if it matches the source files.
+        Files are compared by size and mtime first; if those differ, by content hash.
+        """
+        try:
+            with open(snapshot_path, 'rb') as file:
+                snapshot = pickle.load(file)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable GTFS snapshot {snapshot_path}: {e}")
+            return False
+        
+        if snapshot.get('version') != SNAPSHOT_VERSION or set(snapshot.get('sources', {})) != set(sources):
+            logger.info("GTFS snapshot format or source list changed, reparsing")
+            return False
+        
+        touched = False
+        for filename, filepath in sources.items():
+            recorded = snapshot['sources'][filename]
+            current = _stat_source(filepath)
+            if recorded is None or current is None:
+                if recorded != current:
+                    logger.info(f"GTFS source {filename} appeared or disappeared, reparsing")
+                    return False
+                continue
+            
+            if current['size'] == recorded['size'] and current['mtime_ns'] == recorded['mtime_ns']:
+                continue
+            
+            # Touched or re-copied files keep the snapshot if their content is identical
+            if current['size'] != recorded['size'] or _hash_source(filepath) != recorded['sha256']:
+                logger.info(f"GTFS source {filename} changed, reparsing")
+                return False
+            recorded['mtime_ns'] = current['mtime_ns']
+            touched = True
+        
+        # Departures saved to a shared index are not in the snapshot and must be mapped back
+        timetable = snapshot['data']['timetable']
+        if timetable.index_path and not timetable.map_index():
+            logger.info("GTFS departure index missing or stale, reparsing")
+            return False
+        
+        for field in self.SNAPSHOT_FIELDS:
+            setattr(self, field, snapshot['data'][field])
+        
+        if touched:
+            self._save_snapshot(snapshot_path, snapshot)
+        
+        logger.info(f"Loaded GTFS snapshot {snapshot_path}")
+        return True
+    
+    def _write_snapshot(self, snapshot_path: str, sources: Dict[str, str]) -> None:
+        """Write the parsed data and the fingerprint of its source files to a snapshot"""
+        fingerprints = {}
+        for filename, filepath in sources.items():
+            fingerprint = _stat_source(filepath)
+            if fingerprint is not None:
+                fingerprint['sha256'] = _hash_source(filepath)
+            fingerprints[filename] = fingerprint
+        
+        self._save_snapshot(snapshot_path, {
+            'version': SNAPSHOT_VERSION,
+            'sources': fingerprints,
+            'data': {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS},
+        })
+    
+    def _save_snapshot(self, snapshot_path: str, snapshot: Dict[str, Any]) -> None:
+        """Atomically replace the snapshot file so concurrent workers never read a partial one"""
+        try:
+            directory = os.path.dirname(snapshot_path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.gtfs_snapshot.')
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, snapshot_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            logger.info(f"Wrote GTFS snapshot {snapshot_path}")
+        except Exception as e:
+            logger.warning(f"Could not write GTFS snapshot {snapshot_path}: {e}")
     
     def _load_agencies(self, filepath: str) -> None:
         """Load agency data from a GTFS agency.txt file"""
@@ -430,6 +718,15 @@ class GTFSData:
         try:
             with open(filepath, 'r', encoding='utf-8') as file:
                 reader = csv.DictReader(file)
+                
+                # Route codes only depend on (route_id, headsign), and a feed has a
+                # few hundred distinct pairs for tens of thousands of trips
+                route_codes = {}
+                
+                # Distinct (lowercase headsign, route code) pairs in first-seen order,
+                # matched against stations once after the single pass over the file
+                line_headsigns = {}
+                
                 for row in reader:
                     # Skip rows without trip_id
                     if 'trip_id' not in row:
@@ -439,16 +736,24 @@ class GTFSData:
                     
                     # Get the route for this trip
                     route_id = row.get('route_id', '')
-                    route = self.routes.get(route_id, {})
-                    route_code = route.get('route_code', self._extract_route_code_from_trip_id(route_id))
                     
                     # Extract train line from trip headsign if available
                     trip_headsign = row.get('trip_headsign', '')
-                    if not route_code or route_code == 'GO':
-                        route_code = self._extract_route_code_from_headsign(trip_headsign)
                     
-                    # Add to trips dictionary
-                    self.trips[trip_id] = {
+                    key = (route_id, trip_headsign)
+                    route_code = route_codes.get(key)
+                    if route_code is None:
+                        route = self.routes.get(route_id, {})
+                        if 'route_code' in route:
+                            route_code = route['route_code']
+                        else:
+                            route_code = self._extract_route_code_from_trip_id(route_id)
+                        if not route_code or route_code == 'GO':
+                            route_code = self._extract_route_code_from_headsign(trip_headsign)
+                        route_codes[key] = route_code
+                    
+                    # Add to trips table
+                    self.trips.add(trip_id, {
                         'route_id': route_id,
                         'service_id': row.get('service_id', ''),
                         'trip_headsign': trip_headsign,
@@ -458,20 +763,22 @@ class GTFSData:
                         'wheelchair_accessible': int(row.get('wheelchair_accessible', 0)),
                         'bikes_allowed': int(row.get('bikes_allowed', 0)),
                         'route_code': route_code
-                    }
+                    })
                     
-                    # Add line to stations that this trip serves
-                    # We use this to determine which lines serve which stations
                     if route_code != 'GO':
-                        for station_id in self.stations:
-                            if station_id in trip_headsign or station_id.lower() in trip_headsign.lower():
-                                if route_code not in self.stations[station_id].get('lines', []):
-                                    if 'lines' not in self.stations[station_id]:
-                                        self.stations[station_id]['lines'] = []
-                                    self.stations[station_id]['lines'].append(route_code)
+                        line_headsigns.setdefault((trip_headsign.lower(), route_code), None)
                 
                 logger.info(f"Loaded {len(self.trips)} trips")
                 
+                # Add line to stations that these trips serve
+                # We use this to determine which lines serve which stations
+                station_index = self._build_station_id_index()
+                for (headsign, route_code) in line_headsigns:
+                    for station_id in self._match_station_ids(headsign, station_index):
+                        lines = self.stations[station_id].setdefault('lines', [])
+                        if route_code not in lines:
+                            lines.append(route_code)
+                
                 # Ensure all stations have at least one line
                 for station_id, station in self.stations.items():
                     if not station.get('lines'):
@@ -481,6 +788,37 @@ class GTFSData:
             logger.warning(f"Trips file not found: {filepath}")
         except Exception as e:
             logger.error(f"Error loading trip data: {e}")
+    
+    def _load_timetable(self, filepath: str) -> None:
+        """Load departures from stop_times.txt and the service calendar next to it"""
+        # Only keep departures from displayed stations and their child stops (platforms)
+        stop_ids = set(self.stations)
+        stop_ids.update(stop_id for stop_id, stop in self.stops.items() if stop.get('parent_station') in self.stations)
+        self.timetable.load(os.path.dirname(filepath), self.trips, stop_ids)
+    
+    def _build_station_id_index(self) -> Dict[int, Dict[str, List[str]]]:
+        """Index station ids by length, then by lowercase id, for substring matching"""
+        index = {}
+        for station_id in self.stations:
+            if station_id:
+                by_id = index.setdefault(len(station_id), {})
+                by_id.setdefault(station_id.lower(), []).append(station_id)
+        return index
+    
+    def _match_station_ids(self, headsign: str, index: Dict[int, Dict[str, List[str]]]) -> List[str]:
+        """
+        Find every station id that appears (case-insensitively) in a lowercase headsign.
+        Slides one window per distinct id length instead of testing every station.
+        """
+        matches = []
+        for length, by_id in index.items():
+            seen = set()
+            for start in range(len(headsign) - length + 1):
+                window = headsign[start:start + length]
+                if window in by_id and window not in seen:
+                    seen.add(window)
+                    matches.extend(by_id[window])
+        return matches
             
     def _extract_route_code_from_trip_id(self, route_id: str) -> str:
         """Extract line code from route ID (e.g., '01250425-LW' -> 'LW')"""
@@ -556,24 +894,107 @@ class GTFSData:
         # Default to "GO" if no match found
         return "GO"
     
-    def get_station_names(self) -> List[str]:
-        """Get a list of all station names"""
-        return [station['name'] for station in self.stations.values()]
+    @staticmethod
+    def normalize_station_name(name: str) -> str:
+        """Normalize a station name for lenient matching (e.g. "Union Station" -> "union")"""
+        name = name.replace(" GO", "").replace(" Station", "")
+        return " ".join(name.lower().split())
+    
+    def _build_indexes(self) -> None:
+        """Rebuild the station and stop lookup indexes from the loaded data"""
+        by_name = {}
+        by_normalized_name = {}
+        by_code = {}
+        for station in self.stations.values():
+            # Keep the first station for a duplicated name, as the old linear scan did
+            by_name.setdefault(station['name'], station)
+            by_normalized_name.setdefault(self.normalize_station_name(station['name']), station)
+            by_code.setdefault(station['code'], station)
+        
+        stops_by_parent = {}
+        stop_ids_by_parent = {}
+        for stop_id, stop in self.stops.items():
+            stops_by_parent.setdefault(stop.get('parent_station'), []).append(stop)
+            stop_ids_by_parent.setdefault(stop.get('parent_station'), []).append(stop_id)
+        
+        self.station_names = tuple(station['name'] for station in self.stations.values())
+        self.station_name_set = frozenset(self.station_names)
+        self._stations_by_name = by_name
+        self._stations_by_normalized_name = by_normalized_name
+        self._stations_by_code = by_code
+        self._stops_by_parent = stops_by_parent
+        self._stop_ids_by_parent = stop_ids_by_parent
+    
+    def get_station_names(self) -> Tuple[str, ...]:
+        """Get all station names as a cached, immutable tuple"""
+        return self.station_names
+    
+    def has_station(self, name: str) -> bool:
+        """Check whether a station name exists"""
+        return name in self.station_name_set
     
     def get_station_by_name(self, name: str) -> Optional[Dict[str, Any]]:
-        """Get station data by name"""
-        for station_id, station in self.stations.items():
-            if station['name'] == name:
-                return station
-        return None
+        """Get station data by exact name, falling back to the normalized name"""
+        station = self._stations_by_name.get(name)
+        if station is None:
+            station = self._stations_by_normalized_name.get(self.normalize_station_name(name))
+        return station
+    
+    def get_station_by_code(self, code: str) -> Optional[Dict[str, Any]]:
+        """Get station data by station code"""
+        return self._stations_by_code.get(code)
     
     def get_stops_for_station(self, station_id: str) -> List[Dict[str, Any]]:
         """Get all stops associated with a station"""
-        stops_list = []
-        for stop_id, stop in self.stops.items():
-            if stop.get('parent_station') == station_id:
-                stops_list.append(stop)
-        return stops_list
+        return list(self._stops_by_parent.get(station_id, ()))
+        
+    def get_line_code_for_trip(self, trip: Dict[str, Any]) -> str:
+        """Get the line code of a trip, using the "LW - Destination" headsign prefix if needed"""
+        if trip['route_code'] != 'GO':
+            return trip['route_code']
+        prefix, separator, _ = trip['trip_headsign'].partition(' - ')
+        if separator and prefix in self.LINE_COLORS:
+            return prefix
+        return 'GO'
+    
+    def get_next_departures(self, station: Dict[str, Any], when: datetime, limit: int = 24) -> List[Dict[str, Any]]:
+        """
+        Get the next scheduled departures from a station and its child stops.
+        Each departure includes its trip fields and resolved line code.
+        """
+        stop_ids = [station['code']] + self._stop_ids_by_parent.get(station['code'], [])
+        departures = self.timetable.next_departures(stop_ids, when, limit)
+        for departure in departures:
+            departure.update(self.trips[departure['trip_id']])
+            departure['route_code'] = self.get_line_code_for_trip(departure)
+        return departures
+
+    def iter_service_day_departures(self, service_date: date) -> Iterator[Tuple[str, datetime, Dict[str, Any]]]:
+        """
+        Yield (station name, departure time, trip) for every timetabled departure of a
+        service day at a station or its child stops. Trips include their resolved line code.
+        """
+        active = self.timetable.active_service_ids(service_date)
+        if not active:
+            return
+
+        service_start = datetime.combine(service_date, time_of_day())
+        service_ids = self.trips.columns['service_id']
+        trips = {}  # {trip row: trip}, shared by every stop the trip calls at
+
+        for code, station in self.stations.items():
+            for stop_id in [code] + self._stop_ids_by_parent.get(code, []):
+                times, trip_rows = self.timetable.departures.get(stop_id, ((), ()))
+                for seconds, trip_row in zip(times, trip_rows):
+                    if service_ids[trip_row] not in active:
+                        continue
+                    trip = trips.get(trip_row)
+                    if trip is None:
+                        trip_id = self.trips.trip_ids[trip_row]
+                        trip = dict(self.trips[trip_id], trip_id=trip_id)
+                        trip['route_code'] = self.get_line_code_for_trip(trip)
+                        trips[trip_row] = trip
+                    yield station['name'], service_start + timedelta(seconds=seconds), trip
         
     def get_terminals(self, line_code: str) -> List[str]:
         """Get terminal stations for a line"""
@@ -593,5 +1014,158 @@ class GTFSData:
             return ['Union Station', 'Milton GO']
         return ['Union Station']
 
+class GTFSFeed:
+    """
+    Holds the current GTFSData generation and swaps in reloaded ones.
+    A reload builds and validates a complete GTFSData off to the side, then replaces a single
+    reference, so readers never see a half-built feed. Attribute access is forwarded to the
+    current generation, or to the one pinned by the running request.
+    """
+    
+    def __init__(self):
+        self._current = GTFSData()  # Empty until the first load
+        self._pinned = contextvars.ContextVar('gtfs_pinned', default=None)
+        self.ready = threading.Event()  # Set once the first generation is in place
+        self.settled = threading.Event()  # Set once the first load has finished, loaded or failed
+        self.load_error = None
+        self.reloads = 0
+        self.last_reload = None  # time.time() of the last successful swap
+        self._load_thread = None
+        self._load_lock = threading.Lock()  # One load or reload at a time
+        self._start_lock = threading.Lock()  # Guards starting the background load thread
+        self._watcher = None
+    
+    def __getattr__(self, name: str) -> Any:
+        # Only called for names GTFSFeed itself does not define
+        return getattr(self._pinned.get() or self._current, name)
+    
+    @property
+    def current(self) -> GTFSData:
+        return self._current
+    
+    def pin(self) -> contextvars.Token:
+        """Keep the current generation for the rest of this request (or thread/task)"""
+        return self._pinned.set(self._current)
+    
+    def unpin(self, token: contextvars.Token) -> None:
+        self._pinned.reset(token)
+    
+    def load_data(self, use_snapshot: bool = True) -> GTFSData:
+        """Build a new generation, validate it and make it current; raises if it is rejected"""
+        with self._load_lock:
+            started = time.perf_counter()
+            try:
+                data = GTFSData()
+                data.load_data(use_snapshot, validate=lambda parsed: self._validate(parsed, self._current))
+            except Exception:
+                LOAD_SECONDS.labels('rejected').observe(time.perf_counter() - started)
+                raise
+            LOAD_SECONDS.labels('loaded').observe(time.perf_counter() - started)
+            data.generation = self._current.generation + 1
+            self._current = data
+        self.load_error = None
+        self.ready.set()
+        self.settled.set()
+        return data
+    
+    def _validate(self, data: GTFSData, previous: GTFSData) -> None:
+        """Reject a generation that would blank the boards"""
+        if not data.stations or not data.station_names:
+            raise ValueError("GTFS feed has no stations")
+        if previous.trips and not data.trips:
+            raise ValueError("GTFS feed has no trips")
+        if len(previous.timetable) and not len(data.timetable):
+            raise ValueError("GTFS feed has no stop times")
+    
+    def reload(self, reason: str = 'manual') -> bool:
+        """Reload the feed; on failure the current generation stays in place"""
+        logger.info(f"Reloading GTFS data ({reason})")
+        try:
+            data = self.load_data()
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error(f"GTFS reload rejected, keeping generation {self._current.generation}: {e}")
+            return False
+        self.reloads += 1
+        self.last_reload = time.time()
+        logger.info(f"GTFS generation {data.generation} is now current")
+        return True
+    
+    def reload_in_background(self, reason: str = 'manual') -> None:
+        """Reload from a daemon thread, e.g. from a signal handler"""
+        threading.Thread(target=self.reload, args=(reason,), name='gtfs-reload', daemon=True).start()
+    
+    def start_background_load(self) -> None:
+        """
+        Load the first generation in a daemon thread, unless it is already loaded, loading or
+        has failed; after a failure, reload() (SIGHUP, the admin endpoint or the watcher) retries.
+        """
+        # Not the load lock: that is held for a whole parse, and waiters must honour their timeout
+        with self._start_lock:
+            if self.settled.is_set() or (self._load_thread and self._load_thread.is_alive()):
+                return
+            self._load_thread = threading.Thread(target=self._background_load, name='gtfs-load', daemon=True)
+            self._load_thread.start()
+    
+    def _background_load(self) -> None:
+        try:
+            self.load_data()
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error(f"Error loading GTFS data: {e}")
+        finally:
+            # Wake waiters on failure too, rather than leaving them to their timeout (or forever)
+            self.settled.set()
+    
+    def is_ready(self) -> bool:
+        """Whether a complete generation, with its lookup indexes, is in place"""
+        return self.ready.is_set()
+    
+    def ensure_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Start loading if needed and wait until ready; returns False on timeout or failure"""
+        if not self.ready.is_set():
+            self.start_background_load()
+            self.settled.wait(timeout)
+        return self.ready.is_set()
+    
+    def start_watcher(self, interval: float) -> None:
+        """Reload when the feed files change, checking their size and mtime every interval seconds"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='gtfs-watcher', daemon=True)
+        self._watcher.start()
+    
+    def _source_stats(self) -> Dict[str, Optional[Dict[str, int]]]:
+        return {filename: _stat_source(os.path.join(GTFS_BASE_PATH, filename)) for filename in GTFS_SOURCE_FILES}
+    
+    def _watch(self, interval: float) -> None:
+        # Not waiting for the first load: after a failed one, fixed feed files are what reloads it
+        loaded = self._source_stats()
+        pending = None
+        while True:
+            time.sleep(interval)
+            stats = self._source_stats()
+            if stats == loaded:
+                pending = None
+            elif stats != pending:
+                # Changed since the last check; wait one more interval for copies to finish
+                pending = stats
+            else:
+                self.reload('feed files changed')
+                loaded = stats
+                pending = None
+    
+    def stats(self) -> Dict[str, Any]:
+        current = self._current
+        return {
+            'ready': self.ready.is_set(),
+            'generation': current.generation,
+            'reloads': self.reloads,
+            'last_reload': self.last_reload,
+            'load_error': self.load_error,
+            'loaded_from_snapshot': current.loaded_from_snapshot,
+            'load_ms': sum(current.load_timings.values())
+        }
+
 # Create a singleton instance
-gtfs_data = GTFSData()
\ No newline at end of file
+gtfs_data = GTFSFeed()
\ No newline at end of file
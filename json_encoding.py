@@ -0,0 +1,31 @@
+import json
+import hashlib
+import logging
+from datetime import date, datetime
+from werkzeug.http import http_date
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# orjson is an optional speedup; the stdlib encoder produces the same JSON
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    """Encode dates the way Flask's jsonify does (RFC 822 HTTP dates)"""
+    if isinstance(value, (datetime, date)):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(data) -> bytes:
+    """Encode data as compact, key-sorted UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS)
+    return json.dumps(data, default=_default, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def etag(body: bytes) -> str:
+    """Content-hash entity tag for an encoded body"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
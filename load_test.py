@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Concurrent display-connection load test.
+
+Opens many long-lived SSE connections (like idle display boards), holds them,
+and measures /api/schedules latency while they are open. Run it against each
+serving mode to compare how many connections one process can hold:
+
+    gunicorn -w 1 --threads 8 -b :5000 app:app        # threaded WSGI mode
+    uvicorn asgi:application --port 5001               # asyncio mode
+
+    python load_test.py --url http://localhost:5000 --connections 500
+    python load_test.py --url http://localhost:5001 --connections 500
+
+Only the standard library is used.
+"""
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+async def open_stream(host, port, path, timeout):
+    """Open one SSE connection; returns the (reader, writer) once the first frame arrives"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+
+    # Headers, then at least one data or heartbeat frame
+    status = await asyncio.wait_for(reader.readline(), timeout)
+    if b' 200 ' not in status:
+        writer.close()
+        raise ConnectionError(status.decode(errors='replace').strip())
+    await asyncio.wait_for(reader.readuntil(b'\n\n'), timeout)
+    return reader, writer
+
+async def timed_get(host, port, path, timeout):
+    """Time one GET request on a fresh connection, in milliseconds"""
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return (time.perf_counter() - start) * 1000
+
+async def run(url, connections, stream_path, hold, requests, timeout, ramp):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+
+    start = time.perf_counter()
+    results = []
+    for batch_start in range(0, connections, ramp):
+        batch = range(batch_start, min(batch_start + ramp, connections))
+        results += await asyncio.gather(*(open_stream(host, port, stream_path, timeout) for _ in batch),
+                                        return_exceptions=True)
+    connect_seconds = time.perf_counter() - start
+
+    streams = [result for result in results if not isinstance(result, BaseException)]
+    errors = {}
+    for result in results:
+        if isinstance(result, BaseException):
+            errors[type(result).__name__] = errors.get(type(result).__name__, 0) + 1
+
+    # Latency of a board poll while every stream is held open
+    latencies = []
+    for _ in range(requests):
+        try:
+            latencies.append(await timed_get(host, port, '/api/schedules?station=Union%20Station', timeout))
+        except Exception as e:
+            errors[f"poll {type(e).__name__}"] = errors.get(f"poll {type(e).__name__}", 0) + 1
+
+    await asyncio.sleep(hold)
+
+    # Streams still delivering after the hold period
+    alive = 0
+    for reader, writer in streams:
+        if not reader.at_eof():
+            alive += 1
+        writer.close()
+
+    latencies.sort()
+    return {
+        'url': url,
+        'stream_path': stream_path,
+        'requested': connections,
+        'established': len(streams),
+        'alive_after_hold': alive,
+        'connect_seconds': round(connect_seconds, 3),
+        'poll_ms_p50': round(latencies[len(latencies) // 2], 2) if latencies else None,
+        'poll_ms_max': round(latencies[-1], 2) if latencies else None,
+        'errors': errors
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--stream-path', default='/api/alerts/stream')
+    parser.add_argument('--hold', type=float, default=5, help='seconds to hold the connections open')
+    parser.add_argument('--requests', type=int, default=20, help='/api/schedules polls while connections are held')
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--ramp', type=int, default=100, help='connections opened concurrently per batch')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.url, args.connections, args.stream_path, args.hold,
+                             args.requests, args.timeout, args.ramp))
+    print(json.dumps(result, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+import os
+import glob
+import json
+import math
+import time
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: files of exited workers are kept rather than compacted
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Request latencies from 1 ms to 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Exited workers' counters and histograms are folded into this file, so their own can be deleted
+TOMBSTONE_FILE = 'metrics-tombstone.json'
+
+# Updates are not locked: a label lookup is one dict hit and an update a couple of bytecodes.
+# With the lookup, a counter increment costs about 0.5 us and a histogram observation 0.6-0.9 us
+# (benchmarks/bench_metrics.py). Under the GIL an update can only be lost if a thread switch
+# lands between its read and write, which is rare enough for monitoring.
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Per bucket, not cumulative; the last is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+class Metric:
+    """A named metric family with optional labels"""
+    kind = 'untyped'
+    child_class = _CounterChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], Any]] = None, aggregate: str = 'sum'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function  # Evaluated at collection: a value, or {label values: value}
+        self.aggregate = aggregate  # How values from several workers combine: sum, min, max or mean
+        self._children = {}  # {label values as strings: child}
+        self._lookup = {}  # {label values as passed to labels(): child}
+        self._lock = threading.Lock()
+        if not self.labelnames and function is None:
+            self._default = self.labels()
+
+    def labels(self, *values: Any):
+        """Get the child for a set of label values, creating it on first use"""
+        try:
+            return self._lookup[values]
+        except KeyError:
+            pass
+        key = tuple(map(str, values))
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        with self._lock:
+            child = self._children.setdefault(key, self._new_child())
+            # Also remember the values as passed, e.g. an int status code, to skip the conversion
+            self._lookup[values] = child
+        return child
+
+    def set_function(self, function: Callable[[], Any]) -> None:
+        self.function = function
+
+    def _new_child(self):
+        return self.child_class()
+
+    def collect(self) -> Dict[Tuple[str, ...], Any]:
+        """Current values by label values"""
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception as e:
+                logger.error(f"Error collecting metric {self.name}: {e}")
+                return {}
+            if isinstance(value, dict):
+                return {(key if isinstance(key, tuple) else (key,)): float(item) for key, item in value.items()}
+            return {(): float(value)}
+        return {key: child.value for key, child in list(self._children.items())}
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+class Gauge(Metric):
+    kind = 'gauge'
+    child_class = _GaugeChild
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.dec(amount)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def collect(self) -> Dict[Tuple[str, ...], Any]:
+        return {key: (list(child.counts), child.sum) for key, child in list(self._children.items())}
+
+class Registry:
+    """
+    Metric families of this process, rendered in the Prometheus text format.
+    With a shared directory, each worker flushes its values to a file there and a scrape
+    of any worker merges every file, so counts cover all workers behind a load balancer.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self.directory = None
+        self.flush_interval = 5.0
+        self.retention = 600.0  # Seconds after its last flush that a worker's file is compacted
+        self._flusher = None
+        self._flusher_pid = None
+        if hasattr(os, 'register_at_fork'):
+            # Threads do not survive fork, e.g. gunicorn --preload forking workers after configure()
+            os.register_at_fork(after_in_child=self._start_flusher)
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, **kwargs))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, **kwargs))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, **kwargs))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Collect every metric into a JSON-serializable document"""
+        families = {}
+        for metric in list(self._metrics.values()):
+            families[metric.name] = {
+                'kind': metric.kind,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'aggregate': metric.aggregate,
+                'bounds': list(getattr(metric, 'bounds', ())),
+                'samples': [[list(key), value] for key, value in metric.collect().items()]
+            }
+        return {'pid': os.getpid(), 'time': time.time(), 'families': families}
+
+    def configure(self, directory: Optional[str], flush_interval: float = 5.0, retention: float = 600.0) -> None:
+        """Share metrics between worker processes through a directory (None to keep them local)"""
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.retention = retention
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._start_flusher()
+
+    def _start_flusher(self) -> None:
+        """Start this process's flusher thread, once per PID"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        self._flusher = threading.Thread(target=self._run_flusher, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write this process's values to the shared directory"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing metrics file {path}: {e}")
+
+    def _worker_snapshots(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshots in the shared directory by path, including the tombstone"""
+        snapshots = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshots[path] = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.debug(f"Skipping metrics file {path}: {e}")
+        return snapshots
+
+    def _compact(self, snapshots: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fold the files of workers that stopped flushing more than retention seconds ago into the
+        tombstone file and delete them. One process compacts at a time; the others skip it.
+        """
+        tombstone_path = os.path.join(self.directory, TOMBSTONE_FILE)
+        snapshots = _without_compacted(snapshots, tombstone_path)
+        expired_before = time.time() - self.retention
+        if fcntl is None or not any(path != tombstone_path and snapshot['time'] < expired_before
+                                    for path, snapshot in snapshots.items()):
+            return snapshots
+
+        try:
+            lock_file = open(os.path.join(self.directory, '.compact.lock'), 'a')
+        except OSError as e:
+            logger.error(f"Error opening metrics compaction lock: {e}")
+            return snapshots
+        with lock_file:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return snapshots  # Another worker is compacting
+
+            # Re-read under the lock, as another worker may have compacted since
+            snapshots = self._worker_snapshots()
+            current = _without_compacted(snapshots, tombstone_path)
+            for path in snapshots.keys() - current.keys():
+                _unlink(path)  # Folded in by a compaction that stopped before deleting it
+            snapshots = current
+            tombstone = snapshots.get(tombstone_path, {'pid': None, 'time': 0, 'families': {}})
+            expired = [path for path, snapshot in snapshots.items()
+                       if path != tombstone_path and snapshot['time'] < expired_before]
+            if not expired:
+                return snapshots
+
+            # Gauges are dropped, and time 0 keeps the tombstone's merged values out of the live gauges
+            folded = {
+                'pid': None,
+                'time': 0,
+                'families': _merge([tombstone] + [snapshots[path] for path in expired], stale_before=math.inf),
+                'compacted': [[os.path.basename(path), snapshots[path]['time']] for path in expired]
+            }
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(folded, f)
+                os.replace(tmp_path, tombstone_path)
+            except OSError as e:
+                logger.error(f"Error writing metrics tombstone {tombstone_path}: {e}")
+                return snapshots
+            for path in expired:
+                _unlink(path)
+
+            logger.info(f"Compacted {len(expired)} metrics files of exited workers")
+            snapshots = {path: snapshot for path, snapshot in snapshots.items() if path not in expired}
+            snapshots[tombstone_path] = folded
+            return snapshots
+
+    def collect(self) -> Dict[str, Any]:
+        """Families with samples merged across workers when a shared directory is configured"""
+        if not self.directory:
+            return self.snapshot()['families']
+
+        self._start_flusher()  # In case this process was forked without the fork hook
+        self.flush()
+        # Files of exited workers still count towards counters and histograms, which must not
+        # go backwards, but their gauges no longer describe anything
+        return _merge(self._compact(self._worker_snapshots()).values(), time.time() - 3 * self.flush_interval)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {_escape_help(family['help'])}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            labelnames = family['labelnames']
+            for key, value in sorted(family['samples'], key=lambda sample: sample[0]):
+                labels = list(zip(labelnames, key))
+                if family['kind'] == 'histogram':
+                    counts, total = value
+                    cumulative = 0
+                    for bound, count in zip(family['bounds'] + ['+Inf'], counts):
+                        cumulative += count
+                        le = bound if bound == '+Inf' else _format_value(bound)
+                        lines.append(f"{name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def _without_compacted(snapshots: Dict[str, Dict[str, Any]], tombstone_path: str) -> Dict[str, Dict[str, Any]]:
+    """Snapshots without the files already folded into the tombstone"""
+    tombstone = snapshots.get(tombstone_path)
+    if not tombstone:
+        return snapshots
+    compacted = {tuple(item) for item in tombstone.get('compacted', ())}
+    return {path: snapshot for path, snapshot in snapshots.items()
+            if (os.path.basename(path), snapshot['time']) not in compacted}
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError as e:
+        logger.debug(f"Could not delete metrics file {path}: {e}")
+
+def _merge(snapshots: Iterable[Dict[str, Any]], stale_before: float) -> Dict[str, Any]:
+    """Families of several snapshots combined by label values, without the gauges of stale ones"""
+    merged = {}
+    for snapshot in snapshots:
+        live = snapshot['time'] >= stale_before
+        for name, family in snapshot['families'].items():
+            if family['kind'] == 'gauge' and not live:
+                continue
+            target = merged.setdefault(name, dict(family, samples={}))
+            for key, value in family['samples']:
+                target['samples'].setdefault(tuple(key), []).append(value)
+
+    for family in merged.values():
+        family['samples'] = [[list(key), _combine(family, values)] for key, values in family['samples'].items()]
+    return merged
+
+def _combine(family: Dict[str, Any], values: List[Any]) -> Any:
+    if family['kind'] == 'histogram':
+        counts = [sum(column) for column in zip(*(value[0] for value in values))]
+        return [counts, sum(value[1] for value in values)]
+    if family['aggregate'] == 'max':
+        return max(values)
+    if family['aggregate'] == 'min':
+        return min(values)
+    if family['aggregate'] == 'mean':
+        return sum(values) / len(values)
+    return sum(values)
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    escaped = (f'{name}="' + str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') + '"'
+               for name, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+registry = Registry()
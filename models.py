@@ -1,5 +1,6 @@
 import logging
 from datetime import datetime
+from sqlalchemy import insert, select
 from db_init import db
 
 # Configure logging
@@ -16,13 +17,44 @@ class Station(db.Model):
     accessible = db.Column(db.Boolean, default=True)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
-    lines = db.Column(db.String(100), nullable=True)  # comma-separated line codes
-    
+    lines = db.Column(db.String(100), nullable=True)  # comma-separated line codes, kept in sync with line_links
+    line_links = db.relationship('StationLine', backref='station', cascade='all, delete-orphan', lazy='selectin')
+
+    @property
+    def line_codes(self):
+        """Line codes serving this station"""
+        return sorted(link.line_code for link in self.line_links)
+
+    def set_lines(self, line_codes):
+        """Set the lines serving this station"""
+        line_codes = list(dict.fromkeys(line_codes))
+        self.line_links = [StationLine(line_code=code) for code in line_codes]
+        self.lines = ",".join(line_codes)
+
     def __repr__(self):
         return f"<Station {self.code} - {self.name}>"
 
+class StationLine(db.Model):
+    """Association of a station with a line serving it"""
+    __tablename__ = 'station_line'
+    __table_args__ = (
+        # The primary key covers lines-for-a-station; this covers stations-on-a-line
+        db.Index('ix_station_line_line_station', 'line_code', 'station_id'),
+    )
+
+    station_id = db.Column(db.Integer, db.ForeignKey('station.id', ondelete='CASCADE'), primary_key=True)
+    line_code = db.Column(db.String(5), primary_key=True)
+
+    def __repr__(self):
+        return f"<StationLine {self.station_id} - {self.line_code}>"
+
 class Schedule(db.Model):
     """Schedule model representing a train schedule entry"""
+    __table_args__ = (
+        # "Next N departures from a station" is a range scan on this index
+        db.Index('ix_schedule_station_departure', 'station', 'departure_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     station = db.Column(db.String(100), nullable=False)
     train_number = db.Column(db.String(10), nullable=False)  # e.g., "ST01"
@@ -33,10 +65,48 @@ class Schedule(db.Model):
     route_code = db.Column(db.String(5), nullable=False)  # ST, RH, BR, etc.
     accessible = db.Column(db.Boolean, default=True)
     delay_minutes = db.Column(db.Integer, default=0)
+    service_date = db.Column(db.Date, nullable=True, index=True)  # GTFS service day the row was loaded for
     
     def __repr__(self):
         return f"<Schedule {self.train_number} - {self.destination} at {self.departure_time}>"
 
+def stations_on_line(line_code):
+    """Get the stations served by a line, by name"""
+    return (Station.query
+            .join(StationLine)
+            .filter(StationLine.line_code == line_code)
+            .order_by(Station.name)
+            .all())
+
+def lines_for_station(station_id):
+    """Get the line codes serving a station"""
+    return [link.line_code for link in
+            StationLine.query.filter_by(station_id=station_id).order_by(StationLine.line_code)]
+
+def migrate_station_lines():
+    """Create station_line rows from the comma-separated Station.lines of stations that have none"""
+    try:
+        StationLine.__table__.create(db.engine, checkfirst=True)
+        linked = select(StationLine.station_id)
+        stations = db.session.execute(
+            select(Station.id, Station.lines).where(Station.lines.isnot(None), Station.id.not_in(linked))).all()
+
+        rows = []
+        for station_id, lines in stations:
+            for line_code in dict.fromkeys(code.strip() for code in lines.split(",")):
+                if line_code:
+                    rows.append({'station_id': station_id, 'line_code': line_code})
+
+        if rows:
+            db.session.execute(insert(StationLine), rows)
+            db.session.commit()
+            logger.info(f"Migrated {len(rows)} station lines from Station.lines")
+        return len(rows)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error migrating station lines: {e}")
+        raise
+
 def init_demo_data():
     """Initialize demo data for testing purposes"""
     try:
@@ -47,55 +117,59 @@ def init_demo_data():
         
         logger.info("Initializing demo data")
         
+        from schedule_store import bulk_insert  # schedule_store imports this module
+
         # Create some station entries
         stations = [
-            Station(
-                code="UN",
-                name="Union Station",
-                name_fr="Union",
-                accessible=True,
-                lines="LW,LE,ST,RH,BR,KI,MI"
-            ),
-            Station(
-                code="MI",
-                name="Mimico GO",
-                name_fr="Mimico",
-                accessible=True,
-                lines="LW"
-            ),
-            Station(
-                code="EX",
-                name="Exhibition GO",
-                name_fr="Exhibition",
-                accessible=True,
-                lines="LW"
-            ),
-            Station(
-                code="PC",
-                name="Port Credit GO",
-                name_fr="Port Credit",
-                accessible=True,
-                lines="LW"
-            ),
-            Station(
-                code="AJ",
-                name="Ajax GO",
-                name_fr="Ajax",
-                accessible=True,
-                lines="LE"
-            ),
-            Station(
-                code="WH",
-                name="Whitby GO",
-                name_fr="Whitby",
-                accessible=True,
-                lines="LE"
-            )
+            {
+                "code": "UN",
+                "name": "Union Station",
+                "name_fr": "Union",
+                "accessible": True,
+                "lines": "LW,LE,ST,RH,BR,KI,MI"
+            },
+            {
+                "code": "MI",
+                "name": "Mimico GO",
+                "name_fr": "Mimico",
+                "accessible": True,
+                "lines": "LW"
+            },
+            {
+                "code": "EX",
+                "name": "Exhibition GO",
+                "name_fr": "Exhibition",
+                "accessible": True,
+                "lines": "LW"
+            },
+            {
+                "code": "PC",
+                "name": "Port Credit GO",
+                "name_fr": "Port Credit",
+                "accessible": True,
+                "lines": "LW"
+            },
+            {
+                "code": "AJ",
+                "name": "Ajax GO",
+                "name_fr": "Ajax",
+                "accessible": True,
+                "lines": "LE"
+            },
+            {
+                "code": "WH",
+                "name": "Whitby GO",
+                "name_fr": "Whitby",
+                "accessible": True,
+                "lines": "LE"
+            }
         ]
         
-        # Add stations to session
-        for station in stations:
-            db.session.add(station)
+        # Insert the stations, then their station_line rows, in one batch each
+        bulk_insert(stations, model=Station)
+        station_ids = dict(db.session.execute(select(Station.code, Station.id)).all())
+        bulk_insert(({'station_id': station_ids[station["code"]], 'line_code': line_code}
+                     for station in stations for line_code in station["lines"].split(",")), model=StationLine)
         
         # Commit changes
         db.session.commit()
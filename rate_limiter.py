@@ -0,0 +1,138 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Sliding-window-counter rate limiter.
+    Each client keeps only the request counts of the current and previous fixed window;
+    the previous count is weighted by how much of it still overlaps the sliding window.
+    Checks are O(1) and thread-safe, and clients idle for two windows are swept.
+    """
+
+    def __init__(self, limit=30, window=60):
+        self.limit = limit  # Number of requests allowed
+        self.window = window  # Time window in seconds
+        self.clients = {}  # {ip: [window index, previous count, current count]}
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+
+    def is_rate_limited(self, ip):
+        current_time = time.time()
+        window_index, offset = divmod(current_time, self.window)
+
+        with self._lock:
+            if current_time >= self._next_sweep:
+                self._sweep(window_index)
+                self._next_sweep = current_time + self.window
+
+            counts = self.clients.get(ip)
+            if counts is None:
+                counts = self.clients[ip] = [window_index, 0, 0]
+            elif counts[0] != window_index:
+                # Roll the windows forward; anything older than one window no longer counts
+                counts[1] = counts[2] if counts[0] == window_index - 1 else 0
+                counts[2] = 0
+                counts[0] = window_index
+
+            # Check if rate limit exceeded
+            if counts[1] * (1 - offset / self.window) + counts[2] >= self.limit:
+                self.rejected += 1
+                return True
+
+            counts[2] += 1
+            return False
+
+    def _sweep(self, window_index):
+        """Forget clients with no requests in the current or previous window"""
+        idle = [ip for ip, counts in self.clients.items() if counts[0] < window_index - 1]
+        for ip in idle:
+            del self.clients[ip]
+
+class SQLiteRateLimiter(RateLimiter):
+    """
+    Sliding-window-counter rate limiter whose counts live in a SQLite file,
+    so every worker process on a host shares the same limits.
+    """
+
+    def __init__(self, path, limit=30, window=60, name='default'):
+        super().__init__(limit, window)
+        self.path = path
+        self.name = name  # Separates limiters sharing one database
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    name TEXT NOT NULL,
+                    ip TEXT NOT NULL,
+                    window_index INTEGER NOT NULL,
+                    previous_count INTEGER NOT NULL,
+                    current_count INTEGER NOT NULL,
+                    PRIMARY KEY (name, ip)
+                ) WITHOUT ROWID
+            """)
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def is_rate_limited(self, ip):
+        current_time = time.time()
+        window_index, offset = divmod(current_time, self.window)
+        window_index = int(window_index)
+        connection = self._connect()
+
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if current_time >= self._next_sweep:
+                    connection.execute("DELETE FROM rate_limits WHERE name = ? AND window_index < ?",
+                                       (self.name, window_index - 1))
+                    self._next_sweep = current_time + self.window
+
+                row = connection.execute(
+                    "SELECT window_index, previous_count, current_count FROM rate_limits WHERE name = ? AND ip = ?",
+                    (self.name, ip)).fetchone()
+                previous_count, current_count = 0, 0
+                if row is not None:
+                    if row[0] == window_index:
+                        previous_count, current_count = row[1], row[2]
+                    elif row[0] == window_index - 1:
+                        previous_count = row[2]
+
+                limited = previous_count * (1 - offset / self.window) + current_count >= self.limit
+                if not limited:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?, ?, ?)",
+                        (self.name, ip, window_index, previous_count, current_count + 1))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            # Fail open: a locked or broken store must not take the display offline
+            logger.error(f"Rate limiter store error: {e}")
+            return False
+
+        if limited:
+            self.rejected += 1
+        return limited
+
+def create_rate_limiter(limit, window, name):
+    """Create a rate limiter, shared across workers through SQLite if RATE_LIMIT_DB is set"""
+    path = os.environ.get("RATE_LIMIT_DB")
+    if path:
+        return SQLiteRateLimiter(path, limit=limit, window=window, name=name)
+    return RateLimiter(limit=limit, window=window)
@@ -0,0 +1,207 @@
+import io
+import os
+import sys
+import time
+import heapq
+import random
+import marshal
+import pstats
+import logging
+import cProfile
+import itertools
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+from flask import g, request
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Requests carrying this header (from an admin client) are always profiled
+PROFILE_HEADER = 'X-Profile-Request'
+
+# Deeper call chains, and branches under a microsecond, are cut off in collapsed stacks
+MAX_STACK_DEPTH = 64
+MIN_STACK_SECONDS = 1e-6
+
+class RequestProfiler:
+    """
+    Opt-in cProfile sampling of Flask requests.
+    A fraction of requests, plus any admin request carrying PROFILE_HEADER, runs under cProfile;
+    the slowest profiles are kept and can be read back as pstats data or collapsed stacks.
+    Only one request per process is profiled at a time, which also bounds the overhead.
+    Settings and kept profiles belong to the process: with several workers, configure() and
+    the admin endpoints reach whichever worker serves the request.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, keep: int = 20):
+        self.sample_rate = sample_rate  # Fraction of requests to profile; 0 profiles only on request
+        self.keep = keep  # Number of slowest profiles kept
+        self._profiles = []  # Min-heap of (duration, id, profile entry)
+        self._ids = itertools.count(1)
+        self._active = threading.Lock()  # Held while a request is being profiled
+        self._lock = threading.Lock()
+        self._is_admin = lambda: False
+        self.profiled = 0
+        self.skipped = 0  # Sampled while another request was being profiled
+
+    def install(self, app, is_admin: Callable[[], bool]) -> None:
+        self._is_admin = is_admin
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._abandon_request)
+
+    def configure(self, sample_rate: Optional[float] = None, keep: Optional[int] = None) -> None:
+        """Change the sample rate or buffer size of the running process"""
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if keep is not None:
+            with self._lock:
+                self.keep = max(int(keep), 0)
+                while len(self._profiles) > self.keep:
+                    heapq.heappop(self._profiles)
+        logger.info(f"Request profiler: sample rate {self.sample_rate}, keeping {self.keep} profiles")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles = []
+
+    def _wants_profile(self) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return request.headers.get(PROFILE_HEADER) == '1' and self._is_admin()
+
+    def _start_request(self):
+        if not self.keep or not self._wants_profile():
+            return None
+        if not self._active.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one profiler per process, so another profiling tool may hold it
+            self._active.release()
+            logger.debug(f"Could not start request profile: {e}")
+            return None
+        g.request_profile = (profile, time.perf_counter())
+        return None
+
+    def _finish_request(self, response):
+        profile = self._stop()
+        if profile is not None:
+            profile, started = profile
+            self._record(profile, time.perf_counter() - started, response.status_code)
+        return response
+
+    def _abandon_request(self, exc):
+        # after_request does not run when a before_request hook or the view raised
+        self._stop()
+
+    def _stop(self):
+        entry = g.pop('request_profile', None)
+        if entry is not None:
+            entry[0].disable()
+            self._active.release()
+        return entry
+
+    def _record(self, profile: cProfile.Profile, duration: float, status: int) -> None:
+        entry = {
+            'id': next(self._ids),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': status,
+            'duration_ms': duration * 1000,
+            'time': time.time(),
+            'profile': profile
+        }
+        with self._lock:
+            self.profiled += 1
+            item = (duration, entry['id'], entry)
+            if len(self._profiles) < self.keep:
+                heapq.heappush(self._profiles, item)
+            else:
+                heapq.heappushpop(self._profiles, item)
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._profiles, reverse=True)]
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        return next((entry for entry in self._entries() if entry['id'] == profile_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Settings, counters and the kept profiles, slowest first"""
+        return {
+            'pid': os.getpid(),
+            'sample_rate': self.sample_rate,
+            'keep': self.keep,
+            'profiled': self.profiled,
+            'skipped': self.skipped,
+            'profiles': [{key: value for key, value in entry.items() if key != 'profile'}
+                         for entry in self._entries()]
+        }
+
+def pstats_text(profile: cProfile.Profile, sort: str = 'cumulative', limit: int = 50) -> str:
+    """Human-readable pstats report"""
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+def pstats_dump(profile: cProfile.Profile) -> bytes:
+    """Binary pstats data, as written by Stats.dump_stats() and read by pstats or snakeviz"""
+    return marshal.dumps(pstats.Stats(profile).stats)
+
+@lru_cache(maxsize=4096)
+def _module_path(filename: str) -> str:
+    """Path relative to the sys.path entry it was imported from, e.g. flask/app.py rather than app.py"""
+    path = os.path.abspath(filename)
+    roots = [os.path.abspath(entry or os.curdir) for entry in sys.path]
+    # The longest match, so site-packages wins over a prefix such as the virtualenv's root
+    root = max((root for root in roots if path.startswith(root.rstrip(os.sep) + os.sep)), key=len, default=None)
+    return os.path.relpath(path, root) if root else os.path.basename(path)
+
+def _label(func) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name  # Built-ins, e.g. <method 'join' of 'str' objects>
+    if filename.startswith('<'):
+        return f"{name} ({filename}:{line})"  # e.g. <frozen importlib._bootstrap>, <string>
+    return f"{name} ({_module_path(filename)}:{line})"
+
+def collapsed_stacks(profile: cProfile.Profile) -> str:
+    """
+    Collapsed stacks ("a;b;c microseconds" per line) for flamegraph.pl or speedscope.
+    cProfile records callers rather than full stacks, so stacks are rebuilt from the call
+    graph and each function's time is split between its callers by their share of it.
+    """
+    raw = pstats.Stats(profile).stats  # {func: (cc, nc, tt, ct, {caller: (cc, nc, tt, ct)})}
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    totals = {}
+
+    def walk(func, stack, seconds, depth):
+        _, _, own, cumulative, _ = raw[func]
+        share = seconds / cumulative if cumulative else 0.0
+        path = stack + (_label(func),)
+        if own * share > 0:
+            key = ';'.join(path)
+            totals[key] = totals.get(key, 0.0) + own * share
+        if depth >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_seconds in callees.get(func, ()):
+            # Recursion is folded into the outermost call
+            if callee in raw and edge_seconds * share >= MIN_STACK_SECONDS and _label(callee) not in path:
+                walk(callee, path, edge_seconds * share, depth + 1)
+
+    roots = [func for func, (_, _, _, _, callers) in raw.items() if not any(caller in raw for caller in callers)]
+    for root in roots:
+        walk(root, (), raw[root][3], 0)
+
+    return ''.join(f"{stack} {round(seconds * 1e6)}\n" for stack, seconds in totals.items() if seconds >= MIN_STACK_SECONDS)
@@ -0,0 +1,72 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+class ScheduleCache:
+    """
+    Per-station cache of built schedule payloads.
+    An entry is reused until the next minute boundary (board times are shown to the
+    minute) or until the data generation changes, e.g. after a GTFS reload.
+    """
+
+    def __init__(self, builder: Callable[[str], Any], generation: Callable[[], int] = lambda: 0):
+        self._builder = builder  # Builds the payload for a station
+        self._generation = generation  # Returns the current data generation
+        self._entries = {}  # {station: (payload, expires_at, generation)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, station: str) -> Any:
+        """Get the cached payload for a station, or None instead of building it"""
+        now = time.time()
+        generation = self._generation()
+        with self._lock:
+            entry = self._entries.get(station)
+            if entry and now < entry[1] and entry[2] == generation:
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def get(self, station: str) -> Any:
+        """Get the cached payload for a station, building it on a miss"""
+        now = time.time()
+        generation = self._generation()
+
+        with self._lock:
+            entry = self._entries.get(station)
+            if entry and now < entry[1] and entry[2] == generation:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Build outside the lock so one slow station does not block the others
+        payload = self._builder(station)
+        expires_at = (now // 60 + 1) * 60
+
+        with self._lock:
+            self._entries[station] = (payload, expires_at, generation)
+        return payload
+
+    def invalidate(self, station: Optional[str] = None) -> None:
+        """Drop one station's entry, or every entry"""
+        with self._lock:
+            if station is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(station, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
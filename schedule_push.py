@@ -0,0 +1,129 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+def row_key(row: Dict[str, Any], seen: Dict[str, int]) -> str:
+    """Key identifying a board row across updates; must match rowKey() in display.js"""
+    base = f"{row['train']}|{row['departure']}"
+    count = seen.get(base, 0)
+    seen[base] = count + 1
+    return f"{base}#{count}" if count else base
+
+def row_keys(rows: List[Dict[str, Any]]) -> List[str]:
+    seen = {}
+    return [row_key(row, seen) for row in rows]
+
+def diff_rows(old_rows: List[Dict[str, Any]], new_rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Describe how to turn old_rows into new_rows as departed keys, changed rows and added
+    rows with their final index. Returns None if rows that stayed were reordered.
+    """
+    old = dict(zip(row_keys(old_rows), old_rows))
+    new_keys = row_keys(new_rows)
+    new = dict(zip(new_keys, new_rows))
+
+    if [key for key in old if key in new] != [key for key in new_keys if key in old]:
+        return None
+
+    return {
+        'departed': [key for key in old if key not in new],
+        'changed': [{'key': key, 'row': new[key]} for key in new_keys if key in old and old[key] != new[key]],
+        'added': [{'index': index, 'row': new[key]} for index, key in enumerate(new_keys) if key not in old]
+    }
+
+class SchedulePublisher:
+    """
+    Tracks which stations Socket.IO clients are watching and turns schedule changes into
+    per-station deltas (rows added, changed, departed) with a sequence number.
+    Clients start from a snapshot and ask for a new one when they miss a sequence number.
+    """
+
+    def __init__(self, loader: Callable[[str], List[Dict[str, Any]]], interval: float = 1.0):
+        self._loader = loader  # Returns the current formatted rows for a station
+        self.interval = interval  # Seconds between checks for changes
+        self._watchers = {}  # {sid: station}
+        self._watcher_counts = {}  # {station: number of watching sids}
+        self._state = {}  # {station: [seq, rows]}
+        self._lock = threading.Lock()
+        self.deltas = 0
+        self.snapshots = 0
+
+    @staticmethod
+    def room(station: str) -> str:
+        """Socket.IO room for a station's schedule updates"""
+        return f"schedule:{station}"
+
+    def station_for(self, sid: str) -> Optional[str]:
+        return self._watchers.get(sid)
+
+    def subscribe(self, sid: str, station: str) -> Dict[str, Any]:
+        """Watch a station for a client; returns the snapshot the client starts from"""
+        self.unsubscribe(sid)
+        with self._lock:
+            state = self._state.get(station)
+        if state is None:
+            rows = self._loader(station)
+            with self._lock:
+                state = self._state.setdefault(station, [0, rows])
+
+        with self._lock:
+            self._watchers[sid] = station
+            self._watcher_counts[station] = self._watcher_counts.get(station, 0) + 1
+            return {'station': station, 'seq': state[0], 'rows': state[1]}
+
+    def unsubscribe(self, sid: str) -> None:
+        with self._lock:
+            station = self._watchers.pop(sid, None)
+            if station is None:
+                return
+            remaining = self._watcher_counts[station] - 1
+            if remaining:
+                self._watcher_counts[station] = remaining
+            else:
+                del self._watcher_counts[station]
+                self._state.pop(station, None)
+
+    def tick(self) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Check watched stations for changes; returns (station, event, payload) to emit"""
+        with self._lock:
+            stations = list(self._state)
+
+        updates = []
+        for station in stations:
+            try:
+                rows = self._loader(station)
+            except Exception as e:
+                logger.error(f"Error loading schedule for {station}: {e}")
+                continue
+
+            with self._lock:
+                state = self._state.get(station)
+                # Cached payloads are reused as-is, so an unchanged schedule is the same list
+                if state is None or rows is state[1] or rows == state[1]:
+                    if state is not None:
+                        state[1] = rows
+                    continue
+
+                delta = diff_rows(state[1], rows)
+                state[0] += 1
+                state[1] = rows
+                if delta is None:
+                    self.snapshots += 1
+                    updates.append((station, 'schedule_snapshot', {'station': station, 'seq': state[0], 'rows': rows}))
+                else:
+                    self.deltas += 1
+                    updates.append((station, 'schedule_delta', {'station': station, 'seq': state[0], **delta}))
+        return updates
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'clients': len(self._watchers),
+                'stations': len(self._state),
+                'deltas': self.deltas,
+                'snapshots': self.snapshots
+            }
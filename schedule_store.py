@@ -0,0 +1,156 @@
+import io
+import csv
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List
+
+from sqlalchemy import inspect, insert, text
+
+from db_init import db
+from models import Schedule, Station
+from gtfs_parser import gtfs_data
+from go_scraper import scraper
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Rows per executemany batch (or per COPY buffer on PostgreSQL)
+BULK_BATCH_ROWS = 5000
+
+def ensure_schema() -> None:
+    """Bring an existing schedule table up to date with the model's columns and indexes"""
+    table = Schedule.__table__
+    table.create(db.engine, checkfirst=True)
+    columns = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+    if 'service_date' not in columns:
+        logger.info("Adding schedule.service_date column")
+        with db.engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN service_date DATE"))
+    for index in table.indexes:
+        index.create(db.engine, checkfirst=True)
+
+def service_day_rows(service_date: date) -> Iterator[Dict[str, Any]]:
+    """Schedule rows for every GTFS departure of a service day"""
+    for station_name, departure_time, trip in gtfs_data.iter_service_day_departures(service_date):
+        yield {
+            'station': station_name,
+            'train_number': trip['trip_id'].rsplit('-', 1)[-1][:10],
+            'destination': trip['trip_headsign'].split(' - ', 1)[-1][:100],
+            'departure_time': departure_time,
+            'status': 'On time',
+            'platform': None,
+            'route_code': trip['route_code'][:5],
+            'accessible': trip['wheelchair_accessible'] == 1,
+            'delay_minutes': 0,
+            'service_date': service_date
+        }
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _copy_batch(table, batch: List[Dict[str, Any]]) -> None:
+    """Load a batch with PostgreSQL COPY, the fastest path psycopg2 offers"""
+    # COPY skips the model's Python-side defaults, which an executemany insert would apply
+    defaults = {column.name: column.default.arg for column in table.columns
+                if column.default is not None and column.default.is_scalar and column.name not in batch[0]}
+    columns = list(batch[0]) + list(defaults)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        # csv writes None unquoted and empty, which COPY reads as NULL
+        writer.writerow([row.get(column, defaults.get(column)) for column in columns])
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def bulk_insert(rows: Iterable[Dict[str, Any]], batch_size: int = BULK_BATCH_ROWS, model=Schedule) -> int:
+    """
+    Insert rows (dicts with the same keys) into a model's table in batches, with COPY on
+    PostgreSQL and executemany elsewhere. Runs in the current session's transaction;
+    returns the number of rows inserted.
+    """
+    use_copy = db.engine.dialect.name == 'postgresql'
+    count = 0
+    for batch in _batches(rows, batch_size):
+        if use_copy:
+            _copy_batch(model.__table__, batch)
+        else:
+            db.session.execute(insert(model), batch)
+        count += len(batch)
+    return count
+
+def load_service_day(service_date: date) -> int:
+    """Replace the persisted departures of a service day with the GTFS timetable's"""
+    ensure_schema()
+    try:
+        db.session.query(Schedule).filter(Schedule.service_date == service_date).delete(synchronize_session=False)
+        count = bulk_insert(service_day_rows(service_date))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error loading schedules for {service_date}: {e}")
+        raise
+
+    logger.info(f"Loaded {count} departures for {service_date}")
+    return count
+
+def sync_stations() -> int:
+    """Persist the GTFS stations and the lines serving them, matching existing rows by code"""
+    try:
+        existing = {station.code: station for station in Station.query.all()}
+        for code, info in gtfs_data.stations.items():
+            station = existing.get(code)
+            if station is None:
+                station = Station(code=code)
+                db.session.add(station)
+            station.name = info['name']
+            station.latitude = info.get('lat')
+            station.longitude = info.get('lon')
+            station.set_lines(info.get('lines', []))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error syncing stations: {e}")
+        raise
+
+    logger.info(f"Synced {len(gtfs_data.stations)} stations")
+    return len(gtfs_data.stations)
+
+def get_next_departures(station: str, when: datetime, limit: int = 24) -> List[Dict[str, Any]]:
+    """Get the next persisted departures from a station, shaped like GoScraper schedule entries"""
+    rows = (Schedule.query
+            .filter(Schedule.station == station, Schedule.departure_time >= when)
+            .order_by(Schedule.departure_time)
+            .limit(limit)
+            .all())
+    entries = []
+    for row in rows:
+        destination = scraper._clean_destination(row.destination)
+        entries.append({
+            "departure_time": row.departure_time,
+            "destination": destination,
+            "destination_fr": destination,
+            "status": row.status,
+            "estimated": row.status,
+            "platform": row.platform,
+            "route_code": row.route_code,
+            "accessible": row.accessible,
+            "train_number": row.train_number,
+            "color": scraper.get_line_color(row.route_code),
+            "is_express": False,
+            "at_platform": False,
+            "stops": ""
+        })
+    return entries
@@ -4,15 +4,30 @@ from datetime import datetime
 import time
 import json
 
-def fetch_transsee_data():
-    url = 'https://www.transsee.ca/tripmsg?a=go&route=LW'
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36'}
+TRANSSEE_URL = 'https://www.transsee.ca/tripmsg?a=go&route=LW'
+REQUEST_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36'}
+REQUEST_TIMEOUT = 10  # seconds
 
-    response = requests.get(url, headers=headers)
+def fetch_transsee_data():
+    response = requests.get(TRANSSEE_URL, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
 
     return response.text
 
+def fetch_transsee_conditional(etag=None, last_modified=None):
+    """Fetch the TransSee page with If-None-Match/If-Modified-Since; returns the response (304 if unchanged)"""
+    headers = dict(REQUEST_HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    response = requests.get(TRANSSEE_URL, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code != 304:
+        response.raise_for_status()
+
+    return response
+
 def parse_transsee_data(html_content):
     soup = BeautifulSoup(html_content, 'html.parser')
     messages = []
@@ -0,0 +1,209 @@
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+
+def format_event(data: Any) -> str:
+    """Encode data as a Server-Sent Events data frame"""
+    return f"data: {json.dumps(data)}\n\n"
+
+class Subscription:
+    """One client's bounded queue of pre-encoded frames for a topic"""
+
+    def __init__(self, topic: str, queue_size: int):
+        self.topic = topic
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def deliver(self, frame: str) -> bool:
+        """Queue a frame; returns False if the client is a full queue behind"""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            return False
+
+class AsyncSubscription(Subscription):
+    """Subscription consumed by an asyncio task; frames are handed over to its event loop"""
+
+    def __init__(self, topic: str, queue_size: int, loop: asyncio.AbstractEventLoop):
+        self.topic = topic
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.loop = loop
+        self.closed = False
+
+    def deliver(self, frame: str) -> bool:
+        if self.queue.qsize() >= self.queue.maxsize:
+            return False
+        self.loop.call_soon_threadsafe(self._put, frame)
+        return True
+
+    def _put(self, frame: str) -> None:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.closed = True
+
+class BroadcastHub:
+    """
+    Publish/subscribe hub for Server-Sent Events.
+    Each update is computed and encoded once, then fanned out to per-client bounded
+    queues. Clients that fall a full queue behind are dropped and reconnect on their own.
+    """
+
+    def __init__(self, queue_size: int = 16, heartbeat: float = 15):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat  # Seconds of silence before a keep-alive comment
+        self._subscribers = {}  # {topic: set of Subscription}
+        self._retained = {}  # {topic: last retained frame}, sent to new subscribers
+        self._producers = {}  # {topic: (producer function, interval)}
+        self._producer_threads = {}
+        self._listeners = {}  # {topic: [callables receiving the published data]}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Subscribe to a topic, starting its producer if needed"""
+        return self._add_subscription(Subscription(topic, self.queue_size))
+
+    def subscribe_async(self, topic: str) -> AsyncSubscription:
+        """Subscribe from a coroutine running on an asyncio event loop"""
+        return self._add_subscription(AsyncSubscription(topic, self.queue_size, asyncio.get_running_loop()))
+
+    def _add_subscription(self, subscription: Subscription) -> Subscription:
+        with self._lock:
+            self._subscribers.setdefault(subscription.topic, set()).add(subscription)
+            retained = self._retained.get(subscription.topic)
+        if retained is not None:
+            subscription.queue.put_nowait(retained)
+        self._start_producer(subscription.topic)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                # Per-display topics would otherwise leave an empty set behind for every session
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    def publish(self, topic: str, data: Any, retain: bool = False) -> None:
+        """Encode data once and queue it for every subscriber of a topic"""
+        frame = format_event(data)
+        with self._lock:
+            if retain:
+                self._retained[topic] = frame
+            subscribers = list(self._subscribers.get(topic, ()))
+            self.published += 1
+
+        family = topic.split(':', 1)[0]
+        listeners = list(self._listeners.get(topic, ()))
+        if family != topic:
+            listeners += self._listeners.get(family, ())
+        for listener in listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                logger.error(f"Error in SSE listener for {topic}: {e}")
+
+        for subscription in subscribers:
+            if not subscription.deliver(frame):
+                logger.debug(f"Dropping slow SSE client on {topic}")
+                with self._lock:
+                    self.dropped += 1
+                self.unsubscribe(subscription)
+
+    def stream(self, topic: str, initial: Iterable[Any] = ()) -> Iterator[str]:
+        """
+        Subscribe to a topic and yield its frames, with heartbeats, until the client is dropped or disconnects.
+        Items in initial are sent first, e.g. state that is specific to this client.
+        """
+        # Subscribing here rather than in the view means a response that is never iterated
+        # (an error in between, or the server dropping it) never holds a subscription
+        subscription = self.subscribe(topic)
+        try:
+            for data in initial:
+                yield format_event(data)
+            while not subscription.closed:
+                try:
+                    yield subscription.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield HEARTBEAT_FRAME
+        finally:
+            # Runs when the client disconnects and the WSGI server closes the generator
+            self.unsubscribe(subscription)
+
+    async def stream_async(self, subscription: AsyncSubscription, initial: Iterable[Any] = ()) -> AsyncIterator[str]:
+        """Asyncio version of stream(); waiting clients hold no thread"""
+        try:
+            for data in initial:
+                yield format_event(data)
+            while not subscription.closed:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_FRAME
+        finally:
+            self.unsubscribe(subscription)
+
+    def add_listener(self, topic: str, listener: Callable[[Any], None]) -> None:
+        """
+        Call listener with the raw data of every update published on a topic.
+        A listener on 'station' also hears scoped topics such as 'station:<display id>'.
+        """
+        self._listeners.setdefault(topic, []).append(listener)
+
+    def add_producer(self, topic: str, producer: Callable[[], Any], interval: float) -> None:
+        """
+        Register a function whose result is published (and retained) on a topic every
+        interval seconds when it changes. It runs in one thread, started by the first subscriber.
+        """
+        self._producers[topic] = (producer, interval)
+
+    def _start_producer(self, topic: str) -> None:
+        if topic not in self._producers:
+            return
+        with self._lock:
+            thread = self._producer_threads.get(topic)
+            if thread and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._run_producer, args=(topic,), name=f'sse-{topic}', daemon=True)
+            self._producer_threads[topic] = thread
+        thread.start()
+
+    def _run_producer(self, topic: str) -> None:
+        producer, interval = self._producers[topic]
+        last = None
+        while True:
+            try:
+                data = producer()
+                if data != last:
+                    self.publish(topic, data, retain=True)
+                    last = data
+            except Exception as e:
+                logger.error(f"Error in SSE producer for {topic}: {e}")
+            time.sleep(interval)
+
+    def client_count(self, topic: Optional[str] = None) -> int:
+        """Number of connected clients, for one topic or in total"""
+        with self._lock:
+            if topic is not None:
+                return len(self._subscribers.get(topic, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = {topic: len(subscribers) for topic, subscribers in self._subscribers.items()}
+        return {'clients': clients, 'published': self.published, 'dropped': self.dropped}
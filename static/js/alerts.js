@@ -2,6 +2,7 @@
 // Alert update handling
 let lastUpdate = 0;
 const updateInterval = 30000; // 30 seconds
+let alertsEtag = null; // ETag of the alerts currently shown
 
 function updateAlerts() {
     const now = Date.now();
@@ -10,9 +11,21 @@ function updateAlerts() {
         return;
     }
     
-    fetch('/api/alerts')
-        .then(response => response.json())
+    const headers = alertsEtag ? { 'If-None-Match': alertsEtag } : {};
+    fetch('/api/alerts', { headers, cache: 'no-store' })
+        .then(response => {
+            if (response.status === 304) {
+                // Unchanged; keep the messages already shown
+                lastUpdate = now;
+                return null;
+            }
+            alertsEtag = response.headers.get('ETag');
+            return response.json();
+        })
         .then(data => {
+            if (data === null) {
+                return;
+            }
             if (data.alerts && data.alerts.length > 0) {
                 const alert = data.alerts[0];
                 document.getElementById('alert-message-en').textContent = alert.text || "No current alerts";
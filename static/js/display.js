@@ -1,8 +1,36 @@
+// ETag of the polled schedule currently on screen, sent back as If-None-Match.
+// Cleared whenever anything else replaces the rows, so a 304 can never keep another station's rows.
+let scheduleEtag = null;
+// ETag of the alerts currently in the footer
+let footerAlertsEtag = null;
+
+// Fetch JSON, resolving to null if it still matches etag (304 Not Modified), else to { data, etag }
+async function fetchJsonIfChanged(url, etag) {
+    const headers = {};
+    if (etag) {
+        headers['If-None-Match'] = etag;
+    }
+
+    // Bypass the browser cache so a 304 reaches us instead of a replayed body
+    const response = await fetch(url, { headers, cache: 'no-store' });
+    if (response.status === 304) {
+        return null;
+    }
+    if (!response.ok) {
+        throw new Error(`Failed to fetch ${url}: ${response.status}`);
+    }
+
+    return { data: await response.json(), etag: response.headers.get('ETag') };
+}
 
 function updateAlerts() {
-  fetch('/api/alerts')
-    .then(response => response.json())
-    .then(alerts => {
+  fetchJsonIfChanged('/api/alerts', footerAlertsEtag)
+    .then(result => {
+      if (result === null) {
+        return;
+      }
+      footerAlertsEtag = result.etag;
+      const alerts = result.data;
       const alertContainer = document.getElementById('alert-scroller');
       if (alerts && alerts.length > 0) {
         const messages = alerts.map(alert => alert.message).join(' • ');
@@ -60,60 +88,23 @@ async function updateSchedules(force = false) {
     }
     
     try {
-        const stationName = document.querySelector('.station-name').textContent.split('-')[0].trim();
-        const response = await fetch(`/api/schedules?station=${encodeURIComponent(stationName)}`);
+        const stationName = currentStationName();
+        const result = await fetchJsonIfChanged(`/api/schedules?station=${encodeURIComponent(stationName)}`, scheduleEtag);
 
-        if (!response.ok) {
-            throw new Error(`Failed to fetch schedules: ${response.status}`);
+        if (result === null) {
+            // Unchanged since the last poll; keep the rows already on screen
+            lastUpdateTime = Date.now();
+            retryCount = 0;
+            return;
+        }
+        if (currentStationName() !== stationName) {
+            // The station changed while this poll was in flight; its own poll draws the board
+            return;
         }
 
-        const schedules = await response.json();
-        const container = document.getElementById('scheduleRows');
-        container.innerHTML = '';
-
-        schedules.forEach(schedule => {
-            const row = document.createElement('div');
-            row.className = 'schedule-row';
-
-            const statusClass = schedule.status.toLowerCase() === 'delayed' 
-                ? 'status-delayed' 
-                : schedule.status.toLowerCase() === 'cancelled' 
-                    ? 'status-cancelled' 
-                    : '';
+        scheduleEtag = result.etag;
+        scheduleRender(result.data);
 
-            // Format the train info with route code span
-            const [routeCode, ...destinationParts] = schedule.train.split(' ');
-            
-            // Route code colored span
-            const routeCodeSpan = `<span class="route-code" style="background-color: ${schedule.color}">${routeCode}</span>`;
-            
-            // Format platform display
-            let platformDisplay = schedule.status;
-            
-            // If the status is a platform number (when train is on time)
-            if (schedule.status !== 'Delayed' && schedule.status !== 'Cancelled') {
-                platformDisplay = `<span class="platform-number">${schedule.status}</span>`;
-                if (schedule.accessible) {
-                    platformDisplay += ` ${accessibilityIcon}`;
-                }
-            }
-
-            row.innerHTML = `
-                <div class="col-scheduled">${schedule.departure}</div>
-                <div class="col-to">
-                    ${routeCodeSpan}
-                    ${schedule.destination}
-                </div>
-                <div class="col-stop">
-                    ${destinationParts.join(' ')}
-                </div>
-                <div class="col-platform ${statusClass}">
-                    ${platformDisplay}
-                </div>
-            `;
-            container.appendChild(row);
-        });
-        
         // Update last successful update time
         lastUpdateTime = Date.now();
         retryCount = 0;
@@ -122,7 +113,9 @@ async function updateSchedules(force = false) {
         retryCount++;
         
         if (retryCount > MAX_RETRIES) {
-            // Show error message after multiple retries
+            // Show error message after multiple retries; the next good poll must redraw the rows
+            scheduleEtag = null;
+            boardRows.clear();
             const container = document.getElementById('scheduleRows');
             container.innerHTML = `
                 <div role="alert">
@@ -137,6 +130,148 @@ async function updateSchedules(force = false) {
     }
 }
 
+// Rows on the board, keyed by train and departure time: {element, cells, values}
+const boardRows = new Map();
+let pendingSchedules = null;
+let renderFrame = null;
+
+// Key identifying a departure across polls; repeats get an occurrence suffix
+function rowKey(schedule, seen) {
+    const base = `${schedule.train}|${schedule.departure}`;
+    const count = seen.get(base) || 0;
+    seen.set(base, count + 1);
+    return count ? `${base}#${count}` : base;
+}
+
+// Cell contents for one departure, compared against what the row already shows
+function rowValues(schedule) {
+    const statusClass = schedule.status.toLowerCase() === 'delayed'
+        ? 'status-delayed'
+        : schedule.status.toLowerCase() === 'cancelled'
+            ? 'status-cancelled'
+            : '';
+
+    // Format the train info with route code span
+    const [routeCode, ...destinationParts] = schedule.train.split(' ');
+    const routeCodeSpan = `<span class="route-code" style="background-color: ${schedule.color}">${routeCode}</span>`;
+
+    // Format platform display
+    let platformDisplay = schedule.status;
+
+    // If the status is a platform number (when train is on time)
+    if (schedule.status !== 'Delayed' && schedule.status !== 'Cancelled') {
+        platformDisplay = `<span class="platform-number">${schedule.status}</span>`;
+        if (schedule.accessible) {
+            platformDisplay += ` ${accessibilityIcon}`;
+        }
+    }
+
+    return {
+        scheduled: schedule.departure,
+        to: `${routeCodeSpan} ${schedule.destination}`,
+        stop: destinationParts.join(' '),
+        platform: platformDisplay,
+        platformClass: `col-platform ${statusClass}`.trim()
+    };
+}
+
+function createRow() {
+    const element = document.createElement('div');
+    element.className = 'schedule-row';
+    const cells = {};
+    for (const name of ['scheduled', 'to', 'stop', 'platform']) {
+        cells[name] = document.createElement('div');
+        cells[name].className = `col-${name}`;
+        element.appendChild(cells[name]);
+    }
+    return { element, cells, values: {} };
+}
+
+// Write only the cells whose contents changed; returns the number of cells written
+function patchRow(row, values) {
+    let writes = 0;
+    for (const name of ['scheduled', 'to', 'stop', 'platform']) {
+        if (row.values[name] !== values[name]) {
+            row.cells[name].innerHTML = values[name];
+            writes++;
+        }
+    }
+    if (row.values.platformClass !== values.platformClass) {
+        row.cells.platform.className = values.platformClass;
+        writes++;
+    }
+    row.values = values;
+    return writes;
+}
+
+// Reconcile the board with a new schedule list using as few DOM operations as possible
+function renderSchedules(schedules) {
+    const started = performance.now();
+    const container = document.getElementById('scheduleRows');
+    const stats = { rows: schedules.length, inserted: 0, removed: 0, moved: 0, cellWrites: 0 };
+
+    // Drop the placeholder or error message before the first keyed render
+    if (boardRows.size === 0) {
+        container.textContent = '';
+    }
+
+    const seen = new Map();
+    const entries = schedules.map(schedule => [rowKey(schedule, seen), schedule]);
+    const keys = new Set(entries.map(([key]) => key));
+
+    // Remove departed rows first so the rows that remain keep their relative order
+    for (const [key, row] of boardRows) {
+        if (!keys.has(key)) {
+            row.element.remove();
+            boardRows.delete(key);
+            stats.removed++;
+        }
+    }
+
+    let cursor = container.firstChild;
+    for (const [key, schedule] of entries) {
+        let row = boardRows.get(key);
+        if (!row) {
+            row = createRow();
+            boardRows.set(key, row);
+            stats.inserted++;
+        }
+        stats.cellWrites += patchRow(row, rowValues(schedule));
+
+        if (row.element === cursor) {
+            cursor = cursor.nextSibling;
+        } else {
+            if (row.element.parentNode) {
+                stats.moved++;
+            }
+            container.insertBefore(row.element, cursor);
+        }
+    }
+
+    stats.duration = performance.now() - started;
+    reportRender(stats);
+}
+
+// Timing hook: listen for 'boardrender' on document to collect render times per update
+function reportRender(stats) {
+    document.dispatchEvent(new CustomEvent('boardrender', { detail: stats }));
+    console.debug(`Board render: ${stats.duration.toFixed(2)} ms, ${stats.inserted} inserted, ` +
+                  `${stats.removed} removed, ${stats.moved} moved, ${stats.cellWrites} cell writes`);
+}
+
+// Batch board writes into the next animation frame; only the latest schedule is drawn
+function scheduleRender(schedules) {
+    pendingSchedules = schedules;
+    if (renderFrame === null) {
+        renderFrame = requestAnimationFrame(() => {
+            renderFrame = null;
+            const latest = pendingSchedules;
+            pendingSchedules = null;
+            renderSchedules(latest);
+        });
+    }
+}
+
 // Update station title
 function updateStationTitle(stationName) {
     const stationNameElement = document.querySelector('.station-name');
@@ -152,7 +287,101 @@ function updateStationTitle(stationName) {
         }
         
         // Trigger schedule update after station change
-        updateSchedules(true);
+        scheduleEtag = null;
+        if (socket && socket.connected) {
+            subscribeSchedule(stationName);
+        } else {
+            updateSchedules(true);
+        }
+    }
+}
+
+// Station shown in the board title
+function currentStationName() {
+    return document.querySelector('.station-name').textContent.split('-')[0].trim();
+}
+
+// Schedule pushed over Socket.IO: the rows on screen and the last delta sequence applied
+let pushedSchedules = [];
+let pushedStation = null;
+let pushedSeq = null;
+
+// Ask for a station's snapshot; deltas for it follow in its room
+function subscribeSchedule(stationName) {
+    pushedSeq = null;
+    socket.emit('subscribe_schedule', { station: stationName });
+}
+
+// Turn the previous rows into the new ones: drop departed, replace changed, insert added
+function applyScheduleDelta(rows, delta) {
+    const departed = new Set(delta.departed);
+    const changed = new Map(delta.changed.map(change => [change.key, change.row]));
+    const seen = new Map();
+    const next = [];
+    for (const row of rows) {
+        const key = rowKey(row, seen);
+        if (!departed.has(key)) {
+            next.push(changed.has(key) ? changed.get(key) : row);
+        }
+    }
+    for (const added of delta.added) {
+        next.splice(added.index, 0, added.row);
+    }
+    return next;
+}
+
+function handleScheduleSnapshot(data) {
+    pushedStation = data.station;
+    pushedSeq = data.seq;
+    pushedSchedules = data.rows;
+    scheduleEtag = null;
+    scheduleRender(pushedSchedules);
+
+    // Pushed updates replace polling while the socket is up
+    stopPolling();
+    lastUpdateTime = Date.now();
+}
+
+// The server has no timetable yet; keep polling and ask for the snapshot again later
+function handleScheduleUnavailable(data) {
+    pushedSeq = null;
+    startPolling();
+    const station = currentStationName();
+    setTimeout(() => {
+        if (socket.connected && pushedSeq === null) {
+            subscribeSchedule(station);
+        }
+    }, (data.retry_after || 5) * 1000);
+}
+
+function handleScheduleDelta(data) {
+    if (data.station !== pushedStation) {
+        return;
+    }
+    if (pushedSeq === null || data.seq !== pushedSeq + 1) {
+        // Missed an update; start again from a fresh snapshot
+        console.log(`Schedule sequence gap (${pushedSeq} -> ${data.seq}), resyncing`);
+        subscribeSchedule(pushedStation);
+        return;
+    }
+    pushedSeq = data.seq;
+    pushedSchedules = applyScheduleDelta(pushedSchedules, data);
+    scheduleEtag = null;
+    scheduleRender(pushedSchedules);
+    lastUpdateTime = Date.now();
+}
+
+// Regular schedule polling, used until pushed updates arrive and whenever the socket is down
+function startPolling() {
+    if (updateTimer === null) {
+        updateTimer = setInterval(() => updateSchedules(), 30000); // Update every 30 seconds
+    }
+}
+
+function stopPolling() {
+    if (updateTimer !== null) {
+        clearInterval(updateTimer);
+        updateTimer = null;
     }
 }
 
@@ -189,6 +418,17 @@ function initializeWebSocket() {
     socket.on('station_update', data => {
         updateStationTitle(data.station);
     });
+
+    socket.on('schedule_snapshot', handleScheduleSnapshot);
+    socket.on('schedule_delta', handleScheduleDelta);
+    socket.on('schedule_unavailable', handleScheduleUnavailable);
+
+    socket.on('disconnect', () => {
+        // Resync from a snapshot after reconnecting; poll meanwhile
+        pushedSeq = null;
+        startPolling();
+        updateSchedules(true);
+    });
     
     socket.on('connect_error', () => {
         initializeSSE();
@@ -242,7 +482,7 @@ function initializeDisplay() {
     updateClock();
     
     // Set up a regular schedule update (as a fallback)
-    updateTimer = setInterval(() => updateSchedules(), 30000); // Update every 30 seconds
+    startPolling();
     
     // Initial schedule update
     updateSchedules(true);
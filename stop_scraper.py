@@ -1,7 +1,6 @@
 
 from datetime import datetime
 import logging
-from gtfs_parser import gtfs_data
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -10,10 +9,6 @@ logger = logging.getLogger(__name__)
 class StopScraper:
     """Scraper specifically for stop/station data with protections"""
     
-    def __init__(self):
-        if not gtfs_data.stations:
-            gtfs_data.load_data()
-            
     def clean_station_name(self, station_name):
         """Clean station name by removing unnecessary suffixes"""
         return station_name.replace(" GO", "").replace(" Station", "")
@@ -0,0 +1,381 @@
+import os
+import csv
+import json
+import mmap
+import uuid
+import struct
+import logging
+import tempfile
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Set, Tuple, Any
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Departure index file: header, JSON stop directory, then int32 times and uint32 trip rows.
+# Arrays are in native byte order; the file is only shared between processes on one host.
+INDEX_MAGIC = b'GOTT'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<4sII32sI')  # magic, version, departure count, token, directory length
+
+def parse_gtfs_time(value: str) -> Optional[int]:
+    """
+    Convert a GTFS "HH:MM:SS" time to seconds since the start of the service day.
+    Hours may exceed 23 for trips running past midnight (e.g. "25:10:00").
+    """
+    try:
+        hours, minutes, seconds = value.strip().split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return None
+
+def parse_gtfs_date(value: str) -> Optional[date]:
+    """Convert a GTFS "YYYYMMDD" date to a date"""
+    try:
+        return datetime.strptime(value.strip(), '%Y%m%d').date()
+    except ValueError:
+        return None
+
+class Timetable:
+    """
+    Departure tables built from GTFS stop_times, calendar and calendar_dates.
+    Each stop keeps parallel arrays of departure times (seconds since service-day
+    start) and trip rows, sorted by time so lookups are a binary search.
+    """
+
+    # Characters read from stop_times.txt per chunk; bounds the transient memory of a load
+    STOP_TIMES_CHUNK_BYTES = 4 * 1024 * 1024
+
+    def __init__(self):
+        self.trips = None  # TripTable the trip rows refer to
+        self.departures = {}  # {stop_id: (array of times, array of trip rows)}
+        self.calendar = {}  # {service_id: (weekday flags Mon-Sun, start date, end date)}
+        self.calendar_dates = {}  # {date: {service_id: exception_type}}
+        self._active_services = {}  # {date: active service_id set}
+        self.load_progress = {}  # Streaming metrics of the last stop_times load
+        self.progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None  # Receives load_progress after each chunk
+
+        self.index_path = None  # Memory-mapped departure index backing self.departures, if any
+        self.index_token = None  # Identifies the index generation these trip rows belong to
+        self._index_map = None
+
+    def __getstate__(self):
+        # Callbacks belong to the loading process and are not saved in snapshots
+        state = self.__dict__.copy()
+        state['progress_callback'] = None
+        # Mapped departures stay in the shared index file and are re-mapped by map_index()
+        if self._index_map is not None:
+            state['departures'] = {}
+            state['_index_map'] = None
+        return state
+
+    @property
+    def is_mapped(self) -> bool:
+        return self._index_map is not None
+
+    def save_index(self, path: str) -> None:
+        """
+        Write the departure tables to a memory-mappable index file and map it.
+        The file is written to a temporary name and renamed into place, so processes
+        that already mapped the previous file keep reading it until they re-map.
+        """
+        token = uuid.uuid4().hex.encode('ascii')
+        directory = {}
+        offset = 0
+        for stop_id, (times, _) in self.departures.items():
+            directory[stop_id] = [offset, len(times)]
+            offset += len(times)
+        
+        directory_bytes = json.dumps(directory).encode('utf-8')
+        directory_bytes += b' ' * (-len(directory_bytes) % 4)  # Keep the arrays 4-byte aligned
+
+        folder = os.path.dirname(path) or '.'
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.gtfs_departures.')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, offset, token, len(directory_bytes)))
+                file.write(directory_bytes)
+                for column, typecode in ((0, 'i'), (1, 'I')):
+                    for stop_columns in self.departures.values():
+                        file.write(array(typecode, stop_columns[column]).tobytes())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.index_token = token.decode('ascii')
+        logger.info(f"Wrote departure index {path} ({offset} departures)")
+        if not self.map_index(path):
+            raise RuntimeError(f"Could not map departure index {path}")
+
+    def map_index(self, path: Optional[str] = None) -> bool:
+        """
+        Map a departure index file read-only and serve departures from it.
+        Pages are shared through the OS page cache by every process mapping the same file.
+        Returns False if the file is missing, unreadable or belongs to a different index generation.
+        """
+        path = path or self.index_path
+        if not path:
+            return False
+
+        try:
+            with open(path, 'rb') as file:
+                index_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not open departure index {path}: {e}")
+            return False
+
+        try:
+            magic, version, count, token, directory_length = INDEX_HEADER.unpack_from(index_map)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or (self.index_token and token.decode('ascii') != self.index_token):
+                logger.warning(f"Departure index {path} does not match the loaded GTFS data")
+                index_map.close()
+                return False
+
+            start = INDEX_HEADER.size + directory_length
+            if len(index_map) < start + 8 * count:
+                raise ValueError(f"{len(index_map)} bytes, expected {start + 8 * count}")
+            directory = json.loads(bytes(index_map[INDEX_HEADER.size:start]))
+        except (struct.error, ValueError, UnicodeDecodeError) as e:
+            # Truncated or corrupt, e.g. by a crash mid-write; the caller rebuilds it
+            logger.warning(f"Departure index {path} is unreadable: {e}")
+            index_map.close()
+            return False
+
+        view = memoryview(index_map)
+        times = view[start:start + 4 * count].cast('i')
+        trip_rows = view[start + 4 * count:start + 8 * count].cast('I')
+
+        self.departures = {
+            stop_id: (times[offset:offset + length], trip_rows[offset:offset + length])
+            for stop_id, (offset, length) in directory.items()
+        }
+        self.index_path = path
+        self.index_token = token.decode('ascii')
+        self._index_map = index_map
+        logger.info(f"Mapped departure index {path} ({count} departures)")
+        return True
+
+    def __len__(self) -> int:
+        return sum(len(times) for times, _ in self.departures.values())
+
+    def load(self, base_path: str, trips, stop_ids: Optional[Set[str]] = None) -> None:
+        """Load stop_times (optionally only for stop_ids), calendar and calendar_dates from a GTFS directory"""
+        self.trips = trips
+        self.departures = {}
+        self.index_path = None
+        self.index_token = None
+        self._index_map = None
+        self.calendar = {}
+        self.calendar_dates = {}
+        self._active_services = {}
+
+        self._load_calendar(os.path.join(base_path, "calendar.txt"))
+        self._load_calendar_dates(os.path.join(base_path, "calendar_dates.txt"))
+        self._load_stop_times(os.path.join(base_path, "stop_times.txt"), stop_ids)
+
+    def _load_calendar(self, filepath: str) -> None:
+        """Load weekly service patterns from a GTFS calendar.txt file"""
+        weekdays = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+        try:
+            with open(filepath, 'r', encoding='utf-8-sig') as file:
+                for row in csv.DictReader(file):
+                    start_date = parse_gtfs_date(row.get('start_date', ''))
+                    end_date = parse_gtfs_date(row.get('end_date', ''))
+                    if not row.get('service_id') or not start_date or not end_date:
+                        continue
+
+                    self.calendar[row['service_id']] = (
+                        tuple(row.get(day, '0') == '1' for day in weekdays),
+                        start_date,
+                        end_date
+                    )
+
+            logger.info(f"Loaded {len(self.calendar)} calendar services")
+        except FileNotFoundError:
+            logger.warning(f"Calendar file not found: {filepath}")
+        except Exception as e:
+            logger.error(f"Error loading calendar data: {e}")
+
+    def _load_calendar_dates(self, filepath: str) -> None:
+        """Load service additions and removals from a GTFS calendar_dates.txt file"""
+        try:
+            with open(filepath, 'r', encoding='utf-8-sig') as file:
+                count = 0
+                for row in csv.DictReader(file):
+                    service_date = parse_gtfs_date(row.get('date', ''))
+                    if not row.get('service_id') or not service_date:
+                        continue
+
+                    self.calendar_dates.setdefault(service_date, {})[row['service_id']] = int(row.get('exception_type', 1))
+                    count += 1
+
+            logger.info(f"Loaded {count} calendar date exceptions")
+        except FileNotFoundError:
+            logger.warning(f"Calendar dates file not found: {filepath}")
+        except Exception as e:
+            logger.error(f"Error loading calendar dates data: {e}")
+
+    def _load_stop_times(self, filepath: str, stop_ids: Optional[Set[str]] = None) -> None:
+        """
+        Stream departures per stop from a GTFS stop_times.txt file.
+        The file is read in chunks of STOP_TIMES_CHUNK_BYTES and rows are appended straight
+        into per-stop arrays, so peak memory is one chunk plus the kept departures.
+        Only stops in stop_ids are kept when it is given.
+        """
+        start = perf_counter()
+        self.load_progress = {'rows': 0, 'kept': 0, 'bytes': 0, 'total_bytes': 0, 'rows_per_sec': 0.0}
+        try:
+            self.load_progress['total_bytes'] = os.path.getsize(filepath)
+            with open(filepath, 'r', encoding='utf-8-sig', newline='') as file:
+                header_line = file.readline()
+                header = next(csv.reader([header_line]), [])
+                trip_col = header.index('trip_id')
+                stop_col = header.index('stop_id')
+                departure_col = header.index('departure_time')
+                arrival_col = header.index('arrival_time') if 'arrival_time' in header else departure_col
+
+                rows_by_trip = self.trips.rows
+                pending = {}  # {stop_id: (unsorted times, unsorted trip rows)}
+                skipped = 0
+                self._update_progress(0, len(header_line.encode('utf-8-sig')), start)
+
+                while True:
+                    lines = file.readlines(self.STOP_TIMES_CHUNK_BYTES)
+                    if not lines:
+                        break
+
+                    # A quoted field may contain newlines: extend the chunk until its quotes balance,
+                    # so it ends on a record boundary ("" escapes keep the count even)
+                    open_quote = sum(line.count('"') for line in lines) % 2
+                    while open_quote:
+                        line = file.readline()
+                        if not line:
+                            break
+                        lines.append(line)
+                        open_quote ^= line.count('"') % 2
+
+                    records = 0
+                    for row in csv.reader(lines):
+                        if not row:
+                            continue
+                        records += 1
+
+                        stop_id = row[stop_col]
+                        if stop_ids is not None and stop_id not in stop_ids:
+                            continue
+
+                        trip_row = rows_by_trip.get(row[trip_col])
+                        seconds = parse_gtfs_time(row[departure_col] or row[arrival_col])
+                        if trip_row is None or seconds is None:
+                            skipped += 1
+                            continue
+
+                        columns = pending.get(stop_id)
+                        if columns is None:
+                            columns = pending[stop_id] = (array('i'), array('I'))
+                        columns[0].append(seconds)
+                        columns[1].append(trip_row)
+                        self.load_progress['kept'] += 1
+
+                    self._update_progress(records, sum(map(len, lines)), start)
+                    logger.debug(f"stop_times: {self.load_progress['bytes'] * 100 // max(self.load_progress['total_bytes'], 1)}% "
+                                 f"({self.load_progress['rows']} rows, {self.load_progress['rows_per_sec']:.0f} rows/s)")
+
+            # Sizes are counted in characters, so multi-byte text would otherwise stop short of the total
+            self._update_progress(0, self.load_progress['total_bytes'], start)
+            self._store_departures(pending)
+            logger.info(f"Loaded {len(self)} departures at {len(self.departures)} stops from {self.load_progress['rows']} rows "
+                        f"in {perf_counter() - start:.2f}s ({self.load_progress['rows_per_sec']:.0f} rows/s, {skipped} rows skipped)")
+        except FileNotFoundError:
+            logger.warning(f"Stop times file not found: {filepath}")
+        except Exception as e:
+            logger.error(f"Error loading stop times data: {e}")
+
+    def _update_progress(self, rows: int, size: int, start: float) -> None:
+        """Record streaming progress after a chunk (size counts characters, close to bytes for GTFS)"""
+        progress = self.load_progress
+        progress['rows'] += rows
+        progress['bytes'] = min(progress['bytes'] + size, progress['total_bytes'])
+        elapsed = perf_counter() - start
+        progress['rows_per_sec'] = progress['rows'] / elapsed if elapsed > 0 else 0.0
+        if self.progress_callback:
+            self.progress_callback(dict(progress))
+
+    def _store_departures(self, pending: Dict[str, Tuple[array, array]]) -> None:
+        """Sort each stop's streamed departures by time and store them"""
+        for stop_id, (times, trip_rows) in pending.items():
+            order = sorted(range(len(times)), key=times.__getitem__)
+            self.departures[stop_id] = (
+                array('i', (times[index] for index in order)),
+                array('I', (trip_rows[index] for index in order))
+            )
+
+    def active_service_ids(self, service_date: date) -> Set[str]:
+        """Get the service_ids running on a date, applying calendar_dates exceptions"""
+        active = self._active_services.get(service_date)
+        if active is None:
+            weekday = service_date.weekday()
+            active = {
+                service_id
+                for service_id, (days, start_date, end_date) in self.calendar.items()
+                if days[weekday] and start_date <= service_date <= end_date
+            }
+            for service_id, exception_type in self.calendar_dates.get(service_date, {}).items():
+                if exception_type == 1:
+                    active.add(service_id)
+                elif exception_type == 2:
+                    active.discard(service_id)
+            # Boards only ask around today, so keep yesterday to tomorrow rather than every date seen
+            today = date.today()
+            for cached in [cached for cached in self._active_services if abs((cached - today).days) > 1]:
+                del self._active_services[cached]
+            self._active_services[service_date] = active
+        return active
+
+    def next_departures(self, stop_ids: List[str], when: datetime, limit: int = 24) -> List[Dict[str, Any]]:
+        """
+        Get the next departures from any of the given stops at or after a time.
+        Yesterday's service day is included for trips running past midnight, and
+        tomorrow's so a late-evening board is still filled.
+        """
+        service_ids = self.trips.columns['service_id']
+        candidates = []
+
+        for day_offset in (-1, 0, 1):
+            service_date = when.date() + timedelta(days=day_offset)
+            active = self.active_service_ids(service_date)
+            if not active:
+                continue
+
+            service_start = datetime.combine(service_date, time())
+            after = int((when - service_start).total_seconds())
+
+            for stop_id in stop_ids:
+                times, trip_rows = self.departures.get(stop_id, ((), ()))
+                found = 0
+                for index in range(bisect_left(times, after), len(times)):
+                    trip_row = trip_rows[index]
+                    if service_ids[trip_row] not in active:
+                        continue
+
+                    candidates.append((service_start + timedelta(seconds=times[index]), stop_id, trip_row, service_date))
+                    found += 1
+                    if found >= limit:
+                        break
+
+        candidates.sort(key=lambda candidate: candidate[0])
+        return [
+            {
+                'trip_id': self.trips.trip_ids[trip_row],
+                'stop_id': stop_id,
+                'departure_time': departure_time,
+                'service_date': service_date
+            }
+            for departure_time, stop_id, trip_row, service_date in candidates[:limit]
+        ]